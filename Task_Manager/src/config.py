@@ -1,3 +1,6 @@
+import secrets
+
+from functools import lru_cache
 from pydantic import BaseSettings
 
 
@@ -5,3 +8,98 @@ class Settings(BaseSettings):
 
     app_name = "Менеджер задач на FastAPI"
     db_url = "sqlite+aiosqlite:///task_manager.db"  # URL необходим для соединения через SQLAlchemy
+
+    # Параметры движка SQLAlchemy и пула соединений:
+    db_echo = False  # Вывод всех SQL запросов в лог. Заметно снижает производительность, только для отладки
+    db_pool_size = 5  # Количество постоянно открытых соединений в пуле (для SQLite не используется)
+    db_read_pool_size = 4  # Количество соединений-читателей SQLite (писатель всегда один)
+    db_max_overflow = 10  # Количество дополнительных соединений сверх размера пула при пиковой нагрузке
+    db_pool_timeout = 30  # Время ожидания свободного соединения из пула (в секундах)
+    db_pool_recycle = -1  # Время, после которого соединение переоткрывается (в секундах, -1 - никогда)
+    db_pool_pre_ping = False  # Проверка соединения перед каждой выдачей из пула
+    db_statement_cache_size = 500  # Размер кэша скомпилированных SQL выражений SQLAlchemy
+
+    # Групповая фиксация изменений задач: операции, пришедшие за короткое окно, фиксируются одним commit:
+    write_batch_enabled = False
+    write_batch_max_delay = 0.002  # Максимальное время ожидания следующих операций пакета (в секундах)
+    write_batch_max_size = 64  # Максимальное количество операций в одном пакете
+
+    # PRAGMA, выполняемые на каждом соединении с SQLite:
+    sqlite_journal_mode = "WAL"  # Читатели не блокируют писателя и наоборот
+    sqlite_synchronous = "NORMAL"  # В режиме WAL fsync выполняется только при checkpoint
+    sqlite_mmap_size = 256 * 1024 * 1024  # Размер отображаемой в память части файла БД (в байтах)
+    sqlite_cache_size = -64_000  # Размер кэша страниц (отрицательное значение - в килобайтах)
+    sqlite_temp_store = "MEMORY"  # Временные таблицы и индексы хранятся в памяти
+    sqlite_busy_timeout = 5_000  # Время ожидания снятия блокировки БД (в миллисекундах)
+    sqlite_foreign_keys = True  # Проверка внешних ключей
+
+    # Постраничный вывод списка задач:
+    tasks_page_size = 50  # Количество задач на странице по умолчанию
+    tasks_max_page_size = 200  # Максимальное количество задач на странице, которое может запросить клиент
+    tasks_bulk_max_items = 1_000  # Максимальное количество задач в одном массовом запросе
+    export_batch_size = 1_000  # Количество задач, читаемых из БД и отправляемых клиенту за раз при выгрузке
+    import_batch_size = 1_000  # Количество задач, вставляемых в БД одной транзакцией при загрузке из файла
+    import_max_errors = 100  # Максимальное количество причин отказа для отдельных строк в отчете о загрузке
+
+    # Перенос давно завершенных задач в архив (таблицу task_archive):
+    task_archive_interval = 3600  # Интервал между запусками архивации (в секундах), 0 - архивация отключена
+    task_archive_after_days = 30  # Через сколько дней после завершения задача переносится в архив
+    task_archive_batch_size = 1_000  # Количество задач, переносимых одной транзакцией
+
+    # Кэш страниц списка задач и ETag. Версии списков хранятся в памяти процесса, поэтому при запуске нескольких
+    # процессов кэш необходимо отключить:
+    task_list_cache_enabled = True
+    task_list_cache_users = 100_000  # Максимальное количество пользователей, для которых хранится версия списка
+    task_list_cache_size = 10_000  # Максимальное количество страниц в кэше
+
+    # Рассылка изменений задач через SSE и WebSocket (в памяти процесса):
+    task_events_queue_size = 100  # Максимальное количество недоставленных событий подписки, сверх него она закрывается
+    task_events_max_subscriptions_per_user = 10  # Максимальное количество подписок пользователя
+    task_events_keepalive = 15  # Интервал отправки keepalive при отсутствии событий (в секундах)
+
+    # Заранее отрисованные страницы без данных пользователя (стартовая, авторизация, регистрация):
+    static_pages_max_age = 60  # Сколько секунд браузер и прокси могут использовать страницу без проверки ETag
+    static_pages_check_interval = 1  # Как часто проверяется изменение шаблонов (в секундах)
+
+    # Кэш соответствия токен -> пользователь для get_current_user:
+    token_cache_size = 10_000  # Максимальное количество токенов в кэше
+    token_cache_ttl = 60  # Время жизни записи в кэше (в секундах)
+
+    # Периодическая запись счетчиков кэшей и очередей в лог:
+    stats_log_interval = 300  # Интервал между записями (в секундах), 0 - запись отключена
+
+    # Пул для вычисления хешей паролей вне цикла событий:
+    password_hash_executor = "thread"  # "thread" - пул потоков, "process" - пул процессов
+    password_hash_workers = 4  # Количество потоков или процессов в пуле
+    password_hash_max_concurrency = 4  # Максимальное количество одновременно вычисляемых хешей
+    password_hash_max_waiting = 16  # Максимальная длина очереди на хеширование, сверх нее запросы отклоняются
+
+    # Алгоритм и стоимость хеширования паролей. При изменении хеши пересчитываются при следующем входе пользователя:
+    password_hash_algorithm = "pbkdf2_sha256"  # "pbkdf2_sha256" или "bcrypt"
+    pbkdf2_iterations = 100_000
+    bcrypt_rounds = 12
+
+    # Токены доступа:
+    token_mode = "database"  # "database" - токены хранятся в таблице token, "jwt" - подписанные токены без обращения к БД
+    access_token_expire_minutes = 60 * 24 * 14  # Срок действия токена доступа (две недели)
+    jwt_secret_key = secrets.token_urlsafe(32)  # При нескольких процессах необходимо задать общий ключ через окружение
+    jwt_algorithm = "HS256"
+    token_revocation_list_size = 10_000  # Размер списка отозванных подписанных токенов (0 - отключить)
+    max_tokens_per_user = 10  # Максимальное количество действующих токенов пользователя в таблице token
+    token_sweep_interval = 60 * 60  # Период удаления просроченных токенов из таблицы token (в секундах)
+    token_sweep_batch_size = 500  # Количество токенов, удаляемых за одну транзакцию
+
+    # Ограничение частоты попыток входа (защита от перебора паролей):
+    login_rate_limit_window = 60  # Скользящее окно (в секундах)
+    login_attempts_per_email = 10  # Максимальное количество попыток входа для одного email за окно
+    login_attempts_per_ip = 30  # Максимальное количество попыток входа с одного IP-адреса за окно
+    login_rate_limit_max_keys = 10_000  # Максимальное количество отслеживаемых email и IP-адресов
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """
+        Возвращает настройки приложения. Настройки читаются из окружения один раз при первом обращении, после чего
+        используется тот же объект.
+    """
+    return Settings()
@@ -1 +1,3 @@
+from .batching import *
 from .database import *
+from .migrations import *
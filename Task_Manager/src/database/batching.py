@@ -0,0 +1,168 @@
+import asyncio
+import logging
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from Task_Manager.src.config import get_settings
+from .database import async_session_maker
+
+
+logger = logging.getLogger("")
+settings = get_settings()
+
+WriteOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteBatcher:
+    """
+        Групповая фиксация изменений (group commit). Операции записи, поступившие в течение max_delay секунд (но не
+        более max_batch_size штук), выполняются в одной транзакции и фиксируются одним commit, то есть одним fsync
+        для SQLite. Каждый вызывающий получает результат или исключение своей операции.
+
+        Если одна из операций пакета завершилась ошибкой, транзакция пакета откатывается и операции выполняются
+        повторно, каждая в своей транзакции, чтобы ошибка одной операции не отменяла остальные. Поэтому операция должна
+        только изменять БД через переданную сессию и не иметь других побочных эффектов.
+    """
+    def __init__(self, session_maker: async_sessionmaker, max_delay: float, max_batch_size: int):
+        self.session_maker = session_maker
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.operations = 0
+        self.retried_batches = 0
+        self.largest_batch = 0
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """
+            Ставит операцию записи в очередь и ждет фиксации пакета, в который она попала.
+
+            :param operation: Асинхронная функция, принимающая сессию и выполняющая в ней изменения без commit
+            :return: Результат, который вернула операция
+        """
+        # Очередь и обработчик создаются лениво, чтобы привязаться к текущему циклу событий:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future))
+        return await future
+
+    def stats(self) -> Dict[str, float]:
+        """
+            Возвращает счетчики пакетов, по которым можно подобрать max_delay и max_batch_size.
+        """
+        return {
+            'batches': self.batches,
+            'operations': self.operations,
+            'retried_batches': self.retried_batches,
+            'largest_batch': self.largest_batch,
+            'average_batch': self.operations / self.batches if self.batches else 0,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    async def close(self) -> None:
+        """
+            Дожидается фиксации уже поставленных в очередь операций и останавливает обработчик.
+        """
+        if self._worker is None or self._worker.done():
+            return
+
+        await self._queue.join()
+        self._worker.cancel()
+        self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+
+            # Собираем операции, пришедшие за время ожидания, но не больше max_batch_size:
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    batch.append(self._queue.get_nowait() if timeout <= 0 else
+                                 await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                logger.debug(e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOperation, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.operations += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        # Операции, которые вызывающий уже перестал ждать (например, при разрыве соединения), не выполняем:
+        batch = [(operation, future) for operation, future in batch if not future.done()]
+        if not batch:
+            return
+
+        results = []
+        try:
+            async with self.session_maker() as session:
+                for operation, _ in batch:
+                    results.append(await operation(session))
+                await session.commit()
+
+        except Exception as e:
+            logger.debug(e)
+            if len(batch) > 1:
+                self.retried_batches += 1
+            for operation, future in batch:
+                await self._commit_single(operation, future)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _commit_single(self, operation: WriteOperation, future: asyncio.Future) -> None:
+        try:
+            async with self.session_maker() as session:
+                result = await operation(session)
+                await session.commit()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+
+write_batcher = WriteBatcher(
+    session_maker=async_session_maker,
+    max_delay=settings.write_batch_max_delay,
+    max_batch_size=settings.write_batch_max_size
+)
+
+
+async def run_write(session: AsyncSession, operation: WriteOperation) -> Any:
+    """
+        Выполняет операцию записи и фиксирует ее. При включенной групповой фиксации операция передается в общий пакет,
+        иначе выполняется в сессии текущего запроса с отдельным commit.
+
+        :param session: Сессия текущего запроса для записи
+        :param operation: Асинхронная функция, принимающая сессию и выполняющая в ней изменения без commit
+        :return: Результат, который вернула операция
+    """
+    if settings.write_batch_enabled:
+        return await write_batcher.submit(operation)
+
+    result = await operation(session)
+    await session.commit()
+    return result
@@ -1,14 +1,18 @@
 import datetime
-import os
+import logging
+from typing import AsyncGenerator, Dict
 from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, String, Integer, Boolean, TIMESTAMP, ForeignKey, DateTime, Text
+from sqlalchemy import Column, String, Integer, Boolean, TIMESTAMP, ForeignKey, DateTime, Text, Index, event
 
-from Task_Manager.src.config import Settings
+from Task_Manager.src.config import Settings, get_settings
 
-BASE_DIR = os.path.dirname(os.path.abspath(__name__))  # Определение пути текущего файла
+
+logger = logging.getLogger("")
 
 
 class Base(DeclarativeBase):
@@ -20,7 +24,7 @@ class User(Base):
     __tablename__ = 'user'  # Именовать лучше в единственном числе
     id = Column(Integer, primary_key=True, nullable=False)
     username = Column(String, nullable=False)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True, index=True)  # Поиск при каждом входе и регистрации
     hashed_password = Column(String, nullable=False)
     registered_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
     is_active = Column(Boolean, default=True, nullable=False)
@@ -28,25 +32,162 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = 'task'
+    # В SQLite каждый индекс неявно заканчивается id строки, поэтому ix_task_user_id отдает задачи пользователя сразу
+    # упорядоченными по id, а составной индекс - задачи пользователя с нужным статусом:
+    __table_args__ = (
+        Index('ix_task_user_id_is_complete', 'user_id', 'is_complete'),
+    )
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("user.id"))
+    user_id = Column(Integer, ForeignKey("user.id"), index=True)
     title = Column(String, nullable=False)
     is_complete = Column(Boolean, default=False)
+    completed_at = Column(DateTime, index=True)  # Время завершения задачи, по которому задачи переносятся в архив
+
+
+class TaskArchive(Base):
+    __tablename__ = 'task_archive'
+    # Давно завершенные задачи, которые периодически переносятся из task (tasks/archive.py), чтобы таблица task и ее
+    # индексы содержали только актуальные задачи. id задачи в task может быть занят новой задачей и заархивирован
+    # повторно, поэтому у записей архива собственный id, а id задачи хранится в task_id:
+    __table_args__ = (
+        Index('ix_task_archive_user_id_id', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("user.id"))
+    title = Column(String, nullable=False)
+    completed_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+
+class TaskSummary(Base):
+    __tablename__ = 'task_summary'
+    # Счетчики задач пользователя, которые поддерживаются триггерами на таблице task в той же транзакции, что и
+    # изменение задач. Пересчитываются командой python -m Task_Manager.src.tasks.rebuild_summary:
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
 
 
 class Token(Base):
     __tablename__ = 'token'
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("user.id"))
+    user_id = Column(Integer, ForeignKey("user.id"), index=True)
     token = Column(Text, nullable=False, default=lambda: str(uuid4()).replace('-', ''), unique=True)
-    expires = Column(DateTime, default=False)
+    expires = Column(DateTime, default=False, index=True)  # Проверка срока действия и удаление просроченных токенов
 
 
-engine = create_async_engine(
-    Settings(BASE_DIR).db_url,
-    connect_args={'check_same_thread': False},
-    echo=True
-)
+def is_sqlite_file_db(settings: Settings) -> bool:
+    """
+        Проверяет, что приложение работает с SQLite, хранящейся в файле (а не в памяти).
+    """
+    url = make_url(settings.db_url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def get_engine_options(settings: Settings, read_only: bool = False) -> dict:
+    """
+        Собирает параметры движка SQLAlchemy и пула соединений из настроек приложения.
+
+        SQLite допускает много одновременных читателей, но только одного писателя, поэтому для файла SQLite движок для
+        записи получает ровно одно соединение: остальные пишущие запросы ждут его в очереди пула. Движок для чтения
+        получает пул из db_read_pool_size соединений.
+    """
+    url = make_url(settings.db_url)
+    options = {
+        'echo': settings.db_echo,
+        'pool_pre_ping': settings.db_pool_pre_ping,
+        'query_cache_size': settings.db_statement_cache_size,
+        'pool_timeout': settings.db_pool_timeout,
+        'pool_recycle': settings.db_pool_recycle,
+    }
+
+    if url.get_backend_name() != 'sqlite':
+        options.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+        return options
+
+    options['connect_args'] = {'check_same_thread': False}
+    # БД в памяти живет, пока открыто соединение, поэтому для нее оставляем пул по умолчанию (одно соединение).
+    # Для файла по умолчанию используется NullPool, открывающий соединение на каждый запрос, заменяем его пулом:
+    if not is_sqlite_file_db(settings):
+        del options['pool_timeout'], options['pool_recycle']
+        return options
+
+    options['poolclass'] = AsyncAdaptedQueuePool
+    if read_only:
+        options.update(pool_size=settings.db_read_pool_size, max_overflow=settings.db_max_overflow)
+    else:
+        options.update(pool_size=1, max_overflow=0)
+    return options
+
+
+def get_sqlite_pragmas(settings: Settings) -> Dict[str, str]:
+    """
+        Возвращает PRAGMA, которые выполняются на каждом новом соединении с SQLite.
+    """
+    return {
+        'journal_mode': settings.sqlite_journal_mode,
+        'synchronous': settings.sqlite_synchronous,
+        'mmap_size': str(settings.sqlite_mmap_size),
+        'cache_size': str(settings.sqlite_cache_size),
+        'temp_store': settings.sqlite_temp_store,
+        'busy_timeout': str(settings.sqlite_busy_timeout),
+        'foreign_keys': 'ON' if settings.sqlite_foreign_keys else 'OFF',
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+        Обработчик события connect: настраивает каждое новое соединение пула с SQLite.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in get_sqlite_pragmas(get_settings()).items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+
+def set_sqlite_read_only(dbapi_connection, connection_record) -> None:
+    """
+        Обработчик события connect для движка чтения: запрещает на соединении любые изменения БД.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+async def log_sqlite_pragmas() -> None:
+    """
+        Записывает в лог фактические значения PRAGMA соединения с SQLite. SQLite может не применить значение (например,
+        WAL для БД в памяти), поэтому значения читаются из самой БД.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    async with engine.connect() as conn:
+        effective_pragmas = {}
+        for pragma in get_sqlite_pragmas(get_settings()):
+            result = await conn.exec_driver_sql(f"PRAGMA {pragma}")
+            effective_pragmas[pragma] = result.scalar()
+
+    logger.info('SQLite pragmas: ' + ', '.join(f'{pragma}={value}' for pragma, value in effective_pragmas.items()))
+
+
+# Движок для записи (для файла SQLite - единственное соединение-писатель):
+engine = create_async_engine(get_settings().db_url, **get_engine_options(get_settings()))
+
+if engine.dialect.name == 'sqlite':
+    event.listen(engine.sync_engine, 'connect', set_sqlite_pragmas)
+
+# Движок для чтения с отдельным пулом соединений. БД в памяти существует только внутри своего соединения, поэтому
+# для нее читатели используют тот же движок:
+if engine.dialect.name != 'sqlite' or is_sqlite_file_db(get_settings()):
+    read_engine = create_async_engine(get_settings().db_url, **get_engine_options(get_settings(), read_only=True))
+    if read_engine.dialect.name == 'sqlite':
+        event.listen(read_engine.sync_engine, 'connect', set_sqlite_pragmas)
+        event.listen(read_engine.sync_engine, 'connect', set_sqlite_read_only)
+else:
+    read_engine = engine
 
 """
     Создадим объект локальной сессии, чтобы каждая операция с задачами была независимой и в отдельной сессии. 
@@ -64,18 +205,28 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False
 )
 
+async_read_session_maker = async_sessionmaker(
+    read_engine,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 
-async def create_db_and_tables() -> None:
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """
-        Метод создает все таблицы для Базы Данных SQlite.
+        Зависимость создает одну сессию для записи на весь запрос, поэтому все изменения запроса выполняются в одной
+        транзакции. Соединение-писатель берется из пула только при первом обращении к БД и возвращается после
+        commit. Сессия закрывается после обработки запроса.
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    async with async_session_maker() as session:
+        yield session
 
 
-async def get_async_session() -> AsyncSession:
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
     """
-        Метод создает нам экземпляр сессии и отдает для использования и закрывает сессию по выполнении.
+        Зависимость создает сессию только для чтения из отдельного пула читателей, поэтому чтение не ждет в очереди
+        за записью. Ее получают get_current_user и маршруты, которые ничего не изменяют в БД.
     """
-    async with async_session_maker() as session:
-        return session
+    async with async_read_session_maker() as session:
+        yield session
@@ -0,0 +1,303 @@
+import datetime
+import logging
+
+from typing import Awaitable, Callable, List, NamedTuple
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, \
+    TIMESTAMP, func, insert, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .database import engine
+
+
+logger = logging.getLogger("")
+
+# Таблица версии схемы хранится вне Base.metadata, чтобы миграции не создавали и не изменяли ее:
+migrations_metadata = MetaData()
+schema_version = Table(
+    'schema_version',
+    migrations_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String, nullable=False),
+    Column('applied_at', TIMESTAMP, default=datetime.datetime.utcnow),
+)
+
+
+class MigrationError(Exception):
+    """
+        Миграцию нельзя применить без вмешательства администратора БД. Версия схемы не записывается, и миграция
+        повторяется при следующем запуске приложения.
+    """
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[AsyncConnection], Awaitable[None]]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """
+        Декоратор регистрирует функцию как миграцию схемы с указанным номером версии. Номера версий должны
+        возрастать в порядке объявления миграций. Миграция выполняется в транзакции вместе с записью ее версии.
+
+        Миграции должны быть устойчивы к БД, созданной до появления миграций (например, проверять наличие
+        таблиц и индексов), поскольку в такой БД часть изменений уже может быть применена. Миграция применяет схему в
+        том виде, в котором она была на момент написания миграции, а не текущие модели из database.py, иначе
+        поведение уже выпущенной миграции менялось бы вместе с моделями.
+    """
+    def decorator(upgrade: Callable[[AsyncConnection], Awaitable[None]]):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f'Migration version {version} must be greater than {MIGRATIONS[-1].version}')
+        MIGRATIONS.append(Migration(version=version, description=description, upgrade=upgrade))
+        return upgrade
+    return decorator
+
+
+# Схема таблиц и индексов, которую создают миграции 1 и 2:
+schema_v1 = MetaData()
+user_v1 = Table(
+    'user',
+    schema_v1,
+    Column('id', Integer, primary_key=True, nullable=False),
+    Column('username', String, nullable=False),
+    Column('email', String, nullable=False),
+    Column('hashed_password', String, nullable=False),
+    Column('registered_at', TIMESTAMP),
+    Column('is_active', Boolean, nullable=False),
+    Index('ix_user_email', 'email', unique=True),
+)
+Table(
+    'task',
+    schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id')),
+    Column('title', String, nullable=False),
+    Column('is_complete', Boolean),
+    Index('ix_task_user_id', 'user_id'),
+    Index('ix_task_user_id_is_complete', 'user_id', 'is_complete'),
+)
+Table(
+    'token',
+    schema_v1,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id')),
+    Column('token', Text, nullable=False, unique=True),
+    Column('expires', DateTime),
+    Index('ix_token_user_id', 'user_id'),
+    Index('ix_token_expires', 'expires'),
+)
+
+
+@migration(1, 'Create tables')
+async def create_tables(conn: AsyncConnection) -> None:
+    await conn.run_sync(schema_v1.create_all)
+
+
+async def create_index(conn: AsyncConnection, index: Index) -> None:
+    """
+        Создает индекс, если его еще нет. Если уникальный индекс не удается создать из-за дубликатов, миграция
+        прерывается: без индекса поиск по колонке остался бы полным просмотром таблицы, а пропущенную миграцию
+        никто бы не повторил.
+    """
+    try:
+        await conn.run_sync(index.create, checkfirst=True)
+    except IntegrityError as e:
+        raise MigrationError(f'Could not create unique index {index.name}: table {index.table.name} contains duplicate '
+                             f'values ({e.orig}). Remove the duplicates and restart the application to apply the '
+                             f'migration') from e
+
+
+@migration(2, 'Create indexes missing in databases created before they were declared')
+async def create_missing_indexes(conn: AsyncConnection) -> None:
+    # create_all не добавляет индексы в уже существующие таблицы:
+    for table in schema_v1.sorted_tables:
+        for index in table.indexes:
+            await create_index(conn, index)
+
+
+@migration(3, 'Create full-text search index for task titles')
+async def create_task_search_index(conn: AsyncConnection) -> None:
+    # Полнотекстовый поиск реализован на SQLite FTS5. Владелец задачи хранится в индексе отдельной колонкой в виде
+    # токена u<id пользователя>, поэтому условие на владельца выполняется самим индексом, а не фильтром после поиска.
+    # Индекс поддерживается триггерами, поэтому его не нужно обновлять в коде при каждом изменении задач:
+    if conn.dialect.name != 'sqlite':
+        logger.warning('Full-text search index is only supported for SQLite')
+        return
+
+    for statement in (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(owner, title, "
+        "tokenize = 'unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN "
+        "INSERT INTO task_fts (rowid, owner, title) VALUES (new.id, 'u' || new.user_id, new.title); END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN "
+        "DELETE FROM task_fts WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, user_id ON task BEGIN "
+        "UPDATE task_fts SET owner = 'u' || new.user_id, title = new.title WHERE rowid = old.id; END",
+        "DELETE FROM task_fts",
+        "INSERT INTO task_fts (rowid, owner, title) SELECT id, 'u' || user_id, title FROM task",
+    ):
+        await conn.execute(text(statement))
+
+
+# Таблица счетчиков, которую создает миграция 4. Таблица user нужна только для внешнего ключа и не создается:
+schema_v4 = MetaData()
+Table('user', schema_v4, Column('id', Integer, primary_key=True))
+task_summary_v4 = Table(
+    'task_summary',
+    schema_v4,
+    Column('user_id', Integer, ForeignKey('user.id'), primary_key=True),
+    Column('total', Integer, nullable=False),
+    Column('completed', Integer, nullable=False),
+)
+
+
+@migration(4, 'Create per-user task counters maintained by triggers')
+async def create_task_summary(conn: AsyncConnection) -> None:
+    await conn.run_sync(task_summary_v4.create, checkfirst=True)
+    if conn.dialect.name != 'sqlite':
+        logger.warning('Task counters triggers are only supported for SQLite')
+        return
+
+    # Счетчик увеличивается для нового владельца и статуса задачи и уменьшается для старых:
+    increment = ("INSERT INTO task_summary (user_id, total, completed) "
+                 "SELECT new.user_id, 1, coalesce(new.is_complete, 0) WHERE new.user_id IS NOT NULL "
+                 "ON CONFLICT (user_id) DO UPDATE SET total = total + 1, completed = completed + excluded.completed;")
+    decrement = ("UPDATE task_summary SET total = total - 1, completed = completed - coalesce(old.is_complete, 0) "
+                 "WHERE user_id = old.user_id;")
+
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS task_summary_insert AFTER INSERT ON task BEGIN {increment} END",
+        f"CREATE TRIGGER IF NOT EXISTS task_summary_delete AFTER DELETE ON task BEGIN {decrement} END",
+        f"CREATE TRIGGER IF NOT EXISTS task_summary_update AFTER UPDATE OF is_complete, user_id ON task "
+        f"BEGIN {decrement} {increment} END",
+        "DELETE FROM task_summary",
+        "INSERT INTO task_summary (user_id, total, completed) "
+        "SELECT user_id, count(*), coalesce(sum(is_complete), 0) FROM task WHERE user_id IS NOT NULL GROUP BY user_id",
+    ):
+        await conn.execute(text(statement))
+
+
+# Таблицы и индексы, которые создает миграция 5. Из таблицы task описаны только колонки, которые использует миграция.
+# Таблицы user и task миграция не создает:
+schema_v5 = MetaData()
+Table('user', schema_v5, Column('id', Integer, primary_key=True))
+task_v5 = Table(
+    'task',
+    schema_v5,
+    Column('id', Integer, primary_key=True),
+    Column('is_complete', Boolean),
+    Column('completed_at', DateTime),
+    Index('ix_task_completed_at', 'completed_at'),
+)
+task_archive_v5 = Table(
+    'task_archive',
+    schema_v5,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('user_id', Integer, ForeignKey('user.id')),
+    Column('title', String, nullable=False),
+    Column('completed_at', DateTime),
+    Column('archived_at', DateTime, nullable=False),
+    Index('ix_task_archive_user_id_id', 'user_id', 'id'),
+)
+
+
+@migration(5, 'Record task completion time and create task archive table')
+async def create_task_archive(conn: AsyncConnection) -> None:
+    # Колонки completed_at нет в БД, созданной миграцией 1, но может быть в БД, созданной до появления миграций:
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns('task'))
+    if 'completed_at' not in {column['name'] for column in columns}:
+        await conn.execute(text('ALTER TABLE task ADD COLUMN completed_at DATETIME'))
+
+    # Время завершения ранее завершенных задач неизвестно, возраст таких задач отсчитывается от миграции:
+    await conn.execute(update(task_v5).where(task_v5.c.is_complete == True,  # noqa: E712
+                                             task_v5.c.completed_at.is_(None))
+                       .values(completed_at=datetime.datetime.utcnow()))
+    await conn.run_sync(task_archive_v5.create, checkfirst=True)
+    for index in (*task_v5.indexes, *task_archive_v5.indexes):
+        await conn.run_sync(index.create, checkfirst=True)
+
+
+# Таблица архива, которую создает миграция 6 (таблица user не создается):
+schema_v6 = MetaData()
+Table('user', schema_v6, Column('id', Integer, primary_key=True))
+task_archive_v6 = Table(
+    'task_archive',
+    schema_v6,
+    Column('id', Integer, primary_key=True),
+    Column('task_id', Integer, nullable=False),
+    Column('user_id', Integer, ForeignKey('user.id')),
+    Column('title', String, nullable=False),
+    Column('completed_at', DateTime),
+    Column('archived_at', DateTime, nullable=False),
+    Index('ix_task_archive_user_id_id', 'user_id', 'id'),
+    sqlite_autoincrement=True,
+)
+
+
+@migration(6, 'Give archived tasks their own id and keep the task id in a separate column')
+async def add_task_archive_surrogate_key(conn: AsyncConnection) -> None:
+    # В таблице task нет AUTOINCREMENT, поэтому id удаленной задачи может получить новая задача, и ключом архива id
+    # задачи быть не может: повторная архивация задачи с тем же id нарушала бы первичный ключ. В SQLite нельзя изменить
+    # первичный ключ существующей таблицы, поэтому таблица пересоздается с копированием записей. Записи сохраняют
+    # порядок, AUTOINCREMENT не дает повторно использовать id удаленных из архива записей:
+    for index in task_archive_v5.indexes:
+        await conn.run_sync(index.drop)
+    await conn.execute(text('ALTER TABLE task_archive RENAME TO task_archive_v5'))
+    await conn.run_sync(task_archive_v6.create)
+    await conn.execute(text(
+        'INSERT INTO task_archive (task_id, user_id, title, completed_at, archived_at) '
+        'SELECT id, user_id, title, completed_at, archived_at FROM task_archive_v5 ORDER BY id'
+    ))
+    await conn.execute(text('DROP TABLE task_archive_v5'))
+
+
+@migration(7, 'Create unique email index skipped by migration 2 because of duplicate emails')
+async def create_user_email_index(conn: AsyncConnection) -> None:
+    # Раньше миграция 2 пропускала уникальный индекс при дубликатах email и все равно записывала свою версию:
+    for index in user_v1.indexes:
+        await create_index(conn, index)
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    """
+        Возвращает текущую версию схемы БД (0, если миграции еще не применялись).
+    """
+    await conn.run_sync(migrations_metadata.create_all)
+    version = await conn.execute(select(func.max(schema_version.c.version)))
+    return version.scalar() or 0
+
+
+async def run_migrations(bind: AsyncEngine = engine) -> int:
+    """
+        Применяет по порядку миграции, версия которых больше текущей версии схемы. Если схема актуальна, на старте
+        выполняется только проверка версии. Если миграцию нельзя применить (MigrationError), последующие миграции
+        не применяются, а ошибка передается вызывающему, чтобы приложение не запустилось с неполной схемой.
+
+        :param bind: Движок БД, к которой применяются миграции
+        :return: Версия схемы после применения миграций
+    """
+    async with bind.begin() as conn:
+        current_version = await get_schema_version(conn)
+
+    for pending in MIGRATIONS:
+        if pending.version <= current_version:
+            continue
+
+        try:
+            async with bind.begin() as conn:
+                await pending.upgrade(conn)
+                await conn.execute(insert(schema_version).values(version=pending.version,
+                                                                 description=pending.description))
+        except MigrationError as e:
+            logger.error(f'Migration {pending.version} was not applied: {e}')
+            raise
+
+        current_version = pending.version
+        logger.info(f'Applied migration {pending.version}: {pending.description}')
+
+    return current_version
@@ -1,3 +1,4 @@
+import asyncio
 import uvicorn
 import os
 
@@ -5,13 +6,17 @@ from fastapi import FastAPI
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates  # Шаблонизатор
 
-from Task_Manager.src.routers import user_router, db_router
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.routers import api_router, user_router, db_router
+from Task_Manager.src.routers.user_routes import STATIC_PAGE_VARIANTS, static_pages
+from Task_Manager.src.stats import run_stats_logging
 
 task_manager = FastAPI()
 
 # Добавляем роутеры, которые были созданы в рамках других пакетов для облегчения основного файла и создания модальности:
 task_manager.include_router(db_router)
 task_manager.include_router(user_router)
+task_manager.include_router(api_router)
 
 # Привязываем CSS. StaticFiles необходимо для того, чтобы корректно описать, где наша CSS директория:
 task_manager.mount(
@@ -21,6 +26,37 @@ task_manager.mount(
 )
 
 templates = Jinja2Templates(directory='/templates/src')  # Указываем, где будут лежать наши HTML шаблоны
+background_tasks = set()  # Ссылки на фоновые задачи, чтобы их не удалил сборщик мусора
+
+
+@task_manager.on_event("startup")
+async def render_static_pages():
+    """
+        Отрисовываем страницы без данных пользователя на старте, когда известны все маршруты приложения (в том числе
+        static), чтобы первые запросы к ним не ждали шаблонизатор
+    """
+    for name, context in STATIC_PAGE_VARIANTS:
+        static_pages.get(task_manager, name, **context)
+
+
+@task_manager.on_event("startup")
+async def start_stats_logging():
+    """
+        Запускаем периодическую запись счетчиков кэшей и очередей в лог
+    """
+    stats_log_interval = get_settings().stats_log_interval
+    if stats_log_interval > 0:
+        background_tasks.add(asyncio.create_task(run_stats_logging(stats_log_interval)))
+
+
+@task_manager.on_event("shutdown")
+async def stop_stats_logging():
+    """
+        Останавливаем запись счетчиков в лог при остановке приложения
+    """
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
 
 
 if __name__ == '__main__':
@@ -1,2 +1,3 @@
+from .api_routes import *
 from .db_routes import *
 from .user_routes import *
@@ -0,0 +1,427 @@
+import asyncio
+import logging
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, APIRouter, File, Query, Request, Response, UploadFile, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_304_NOT_MODIFIED, HTTP_404_NOT_FOUND, \
+    WS_1008_POLICY_VIOLATION
+from starlette.websockets import WebSocketDisconnect
+
+from Task_Manager.src.database.batching import run_write
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import async_read_session_maker, get_async_session, get_read_session
+from Task_Manager.src.tasks import EXPORT_MEDIA_TYPES, ArchivedTaskPage, BulkResult, ExportFormat, ImportReport, \
+    TaskBulkComplete, TaskBulkCreate, TaskBulkIds, TaskCounts, TaskCreate, TaskPage, TaskRead, TaskRestoreResult, \
+    TaskSearchPage, TaskStatus, add_task, bulk_add_tasks, bulk_delete_tasks, bulk_set_tasks_complete, delete_task, \
+    etag_matches, get_archived_tasks_page, get_cache_headers, get_cached_tasks_page, get_task_counts, import_tasks, \
+    notify_task_changes, restore_archived_tasks, search_tasks, stream_task_events, stream_tasks_export, \
+    task_event_broker, task_list_versions, toggle_task
+from Task_Manager.src.users import CachedUser, authenticate_token, get_connection_token, get_current_user, \
+    get_streaming_user
+
+
+logger = logging.getLogger("")
+
+# JSON API для скриптовых клиентов: ответы сериализуются orjson, без шаблонов и переадресаций:
+api_router = APIRouter(prefix='/api/v1', tags=['api'], default_response_class=ORJSONResponse)
+
+
+@api_router.get('/tasks', name='api_tasks', response_model=TaskPage)
+async def api_tasks(request: Request, response: Response, after: Optional[int] = None,
+                    limit: Optional[int] = Query(default=None, ge=1), status: Optional[TaskStatus] = None,
+                    session: AsyncSession = Depends(get_read_session),
+                    current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция возвращает страницу задач текущего пользователя или 304 Not Modified, если клиент передал ETag
+        текущей версии списка.
+
+        :param request: Запрос, из которого берется заголовок If-None-Match
+        :param response: Ответ, в который добавляются заголовки ETag и Cache-Control
+        :param after: Курсор - id последней задачи предыдущей страницы (next_after из предыдущего ответа)
+        :param limit: Количество задач на странице
+        :param status: Фильтр задач по статусу (open - незавершенные, completed - завершенные)
+        :param session: Объект сессии из SQLAlchemy только для чтения
+        :param current_user: Текущий пользователь
+
+        :return: Страница задач и курсор следующей страницы
+    """
+    try:
+        version = task_list_versions.get(current_user.id)
+        if get_settings().task_list_cache_enabled:
+            headers = get_cache_headers(task_list_versions.etag(current_user.id, version))
+            if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+                return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+            response.headers.update(headers)
+
+        return await get_cached_tasks_page(session=session, user_id=current_user.id, version=version, after=after,
+                                           limit=limit, status=status)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.get('/tasks/summary', name='api_summary', response_model=TaskCounts)
+async def api_summary(session: AsyncSession = Depends(get_read_session),
+                      current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция возвращает количество задач текущего пользователя: всего, незавершенных и завершенных.
+
+        :param session: Объект сессии из SQLAlchemy только для чтения
+        :param current_user: Текущий пользователь
+
+        :return: Счетчики задач
+    """
+    try:
+        return await get_task_counts(session=session, user_id=current_user.id)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.get('/tasks/archive', name='api_archive', response_model=ArchivedTaskPage)
+async def api_archive(after: Optional[int] = None, limit: Optional[int] = Query(default=None, ge=1),
+                      session: AsyncSession = Depends(get_read_session),
+                      current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция возвращает страницу архива задач текущего пользователя - давно завершенных задач, перенесенных из
+        списка задач.
+
+        :param after: Курсор - id последней записи архива предыдущей страницы (next_after из предыдущего ответа)
+        :param limit: Количество задач на странице
+        :param session: Объект сессии из SQLAlchemy только для чтения
+        :param current_user: Текущий пользователь
+
+        :return: Страница архива и курсор следующей страницы
+    """
+    try:
+        return await get_archived_tasks_page(session=session, user_id=current_user.id, after=after, limit=limit)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks/archive/restore', name='api_restore', response_model=TaskRestoreResult)
+async def api_restore(tasks: TaskBulkIds, session: AsyncSession = Depends(get_async_session),
+                      current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция возвращает задачи текущего пользователя из архива в список задач одним commit.
+
+        :param tasks: Идентификационные номера записей архива (id из ответа api_archive)
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Результат для каждой задачи из запроса и восстановленные задачи
+    """
+    try:
+        result = await run_write(session, lambda write_session: restore_archived_tasks(write_session, current_user.id,
+                                                                                       tasks.ids))
+        if result.tasks:
+            notify_task_changes(current_user.id, 'created', tasks=[task.dict() for task in result.tasks])
+        return result
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.get('/tasks/events', name='api_events', response_class=StreamingResponse)
+async def api_events(current_user: CachedUser = Depends(get_streaming_user)):
+    """
+        Функция открывает поток Server-Sent Events с изменениями задач текущего пользователя, выполненными в других
+        вкладках и на других устройствах, чтобы клиенту не приходилось опрашивать список задач. Событие reset означает,
+        что клиенту необходимо заново загрузить список задач.
+
+        :param current_user: Текущий пользователь. Определяется без сессии запроса, чтобы поток не удерживал
+            соединение из пула читателей
+
+        :return: Потоковый ответ text/event-stream
+    """
+    subscription = task_event_broker.subscribe(current_user.id)
+    return StreamingResponse(
+        stream_task_events(subscription, keepalive=get_settings().task_events_keepalive),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@api_router.websocket('/tasks/ws', name='api_events_ws')
+async def api_events_ws(websocket: WebSocket):
+    """
+        Функция передает через WebSocket те же события об изменении задач текущего пользователя, что и /tasks/events.
+        Токен берется из cookie access_token или заголовка Authorization. Сообщения от клиента не ожидаются и
+        игнорируются, они читаются только для того, чтобы узнать об отключении клиента.
+
+        :param websocket: WebSocket соединение
+    """
+    token = get_connection_token(websocket)
+    async with async_read_session_maker() as session:
+        user = await authenticate_token(session=session, token=token) if token else None
+    if user is None or not user.is_active:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = task_event_broker.subscribe(user.id)
+    receive = asyncio.create_task(websocket.receive())
+    try:
+        while True:
+            event = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait((receive, event), return_when=asyncio.FIRST_COMPLETED)
+            if event not in done:
+                event.cancel()
+            elif event.result() is None:
+                await websocket.send_json({'type': 'reset'})
+                await websocket.close()
+                return
+            else:
+                await websocket.send_json(event.result())
+
+            if receive in done:
+                if receive.result()['type'] == 'websocket.disconnect':
+                    return
+                receive = asyncio.create_task(websocket.receive())
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        receive.cancel()
+        task_event_broker.unsubscribe(subscription)
+
+
+@api_router.get('/tasks/export', name='api_export', response_class=StreamingResponse)
+async def api_export(export_format: ExportFormat = Query(default=ExportFormat.ndjson, alias='format'),
+                     current_user: CachedUser = Depends(get_streaming_user)):
+    """
+        Функция выгружает все задачи текущего пользователя потоком в формате NDJSON или CSV. Задачи читаются из БД
+        порциями по мере отправки, поэтому расход памяти не зависит от количества задач.
+
+        :param export_format: Формат выгрузки (ndjson или csv)
+        :param current_user: Текущий пользователь. Определяется без сессии запроса, чтобы во время выгрузки было
+            занято только соединение-читатель, из которого читаются задачи
+
+        :return: Потоковый ответ с задачами
+    """
+    return StreamingResponse(
+        stream_tasks_export(user_id=current_user.id, export_format=export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="tasks.{export_format.value}"'},
+    )
+
+
+@api_router.post('/tasks/import', name='api_import', response_model=ImportReport)
+async def api_import(file: UploadFile = File(...),
+                     import_format: Optional[ExportFormat] = Query(default=None, alias='format'),
+                     session: AsyncSession = Depends(get_async_session),
+                     current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция загружает задачи текущего пользователя из файла CSV (с колонками title и is_complete) или NDJSON
+        (объекты с полями title и is_complete). Файл разбирается построчно, задачи вставляются пакетами, каждый
+        пакет - в отдельной транзакции.
+
+        :param file: Загружаемый файл
+        :param import_format: Формат файла. Если не указан, определяется по расширению имени файла
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Отчет о количестве загруженных и отклоненных строк и времени загрузки
+    """
+    try:
+        if import_format is None:
+            is_csv = (file.filename or '').lower().endswith('.csv')
+            import_format = ExportFormat.csv if is_csv else ExportFormat.ndjson
+
+        report = await import_tasks(session=session, user_id=current_user.id, file=file.file,
+                                    import_format=import_format)
+        notify_task_changes(current_user.id, 'reset')
+        return report
+
+    except Exception as e:
+        logger.debug(e)
+        notify_task_changes(current_user.id, 'reset')  # Часть пакетов могла быть зафиксирована до ошибки
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+    finally:
+        await file.close()
+
+
+@api_router.get('/tasks/search', name='api_search', response_model=TaskSearchPage)
+async def api_search(q: str, offset: int = Query(default=0, ge=0), limit: Optional[int] = Query(default=None, ge=1),
+                     session: AsyncSession = Depends(get_read_session),
+                     current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция ищет задачи текущего пользователя по словам из названия.
+
+        :param q: Поисковый запрос
+        :param offset: Количество пропускаемых результатов (next_offset из предыдущего ответа)
+        :param limit: Количество задач на странице
+        :param session: Объект сессии из SQLAlchemy только для чтения
+        :param current_user: Текущий пользователь
+
+        :return: Страница задач, упорядоченных по релевантности, и смещение следующей страницы
+    """
+    try:
+        return await search_tasks(session=session, user_id=current_user.id, query=q, offset=offset, limit=limit)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks', name='api_add', response_model=TaskRead, status_code=HTTP_201_CREATED)
+async def api_add(task: TaskCreate, session: AsyncSession = Depends(get_async_session),
+                  current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция создает задачу текущего пользователя.
+
+        :param task: Описание новой задачи
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Созданная задача
+    """
+    try:
+        task = await run_write(session, lambda write_session: add_task(write_session, current_user.id, task.title))
+        notify_task_changes(current_user.id, 'created', tasks=[task.dict()])
+        return task
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks/{task_id}/toggle', name='api_toggle', response_model=TaskRead)
+async def api_toggle(task_id: int, session: AsyncSession = Depends(get_async_session),
+                     current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция меняет статус задачи текущего пользователя на противоположный.
+
+        :param task_id: Идентификационный номер задачи
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Задача после изменения
+    """
+    try:
+        task = await run_write(session, lambda write_session: toggle_task(write_session, current_user.id, task_id))
+        if task is None:
+            raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Task not found")
+
+        notify_task_changes(current_user.id, 'updated', tasks=[task.dict()])
+        return task
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.delete('/tasks/{task_id}', name='api_delete', status_code=HTTP_204_NO_CONTENT,
+                   response_class=Response)
+async def api_delete(task_id: int, session: AsyncSession = Depends(get_async_session),
+                     current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция удаляет задачу текущего пользователя.
+
+        :param task_id: Идентификационный номер задачи
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+    """
+    try:
+        deleted = await run_write(session, lambda write_session: delete_task(write_session, current_user.id, task_id))
+        if not deleted:
+            raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Task not found")
+
+        notify_task_changes(current_user.id, 'deleted', ids=[task_id])
+        return Response(status_code=HTTP_204_NO_CONTENT)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks/bulk', name='api_bulk_add', response_model=BulkResult)
+async def api_bulk_add(tasks: TaskBulkCreate, session: AsyncSession = Depends(get_async_session),
+                       current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция создает несколько задач текущего пользователя одним запросом к БД и одним commit.
+
+        :param tasks: Названия новых задач
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Результат (id созданной задачи или причина отказа) для каждого названия
+    """
+    try:
+        results = await run_write(session, lambda write_session: bulk_add_tasks(write_session, current_user.id,
+                                                                                tasks.titles))
+        created = [TaskRead(id=result.id, title=title.strip(), is_complete=False).dict()
+                   for title, result in zip(tasks.titles, results) if result.ok]
+        if created:
+            notify_task_changes(current_user.id, 'created', tasks=created)
+        return BulkResult(results=results)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks/bulk/complete', name='api_bulk_complete', response_model=BulkResult)
+async def api_bulk_complete(tasks: TaskBulkComplete, session: AsyncSession = Depends(get_async_session),
+                            current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция устанавливает статус нескольким задачам текущего пользователя одним запросом к БД и одним commit.
+
+        :param tasks: Идентификационные номера задач и устанавливаемый статус
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Результат для каждой задачи из запроса
+    """
+    try:
+        results = await run_write(session, lambda write_session: bulk_set_tasks_complete(
+            write_session, current_user.id, tasks.ids, tasks.is_complete))
+        completed = [result.id for result in results if result.ok]
+        if completed:
+            notify_task_changes(current_user.id, 'completed', ids=completed, is_complete=tasks.is_complete)
+        return BulkResult(results=results)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@api_router.post('/tasks/bulk/delete', name='api_bulk_delete', response_model=BulkResult)
+async def api_bulk_delete(tasks: TaskBulkIds, session: AsyncSession = Depends(get_async_session),
+                          current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция удаляет несколько задач текущего пользователя одним запросом к БД и одним commit.
+
+        :param tasks: Идентификационные номера задач
+        :param session: Объект сессии из SQLAlchemy
+        :param current_user: Текущий пользователь
+
+        :return: Результат для каждой задачи из запроса
+    """
+    try:
+        results = await run_write(session, lambda write_session: bulk_delete_tasks(write_session, current_user.id,
+                                                                                   tasks.ids))
+        deleted = [result.id for result in results if result.ok]
+        if deleted:
+            notify_task_changes(current_user.id, 'deleted', ids=deleted)
+        return BulkResult(results=results)
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
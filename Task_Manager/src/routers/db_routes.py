@@ -1,16 +1,23 @@
+import asyncio
 import logging
 
-from fastapi import Request, Form, Depends, HTTPException, APIRouter
+from typing import Optional
+
+from fastapi import Request, Form, Depends, HTTPException, APIRouter, Query, Response
 from fastapi.responses import HTMLResponse
 from starlette.responses import RedirectResponse
-from starlette.status import HTTP_303_SEE_OTHER, HTTP_302_FOUND
+from starlette.status import HTTP_303_SEE_OTHER, HTTP_302_FOUND, HTTP_304_NOT_MODIFIED
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from starlette.templating import Jinja2Templates
 
-from Task_Manager.src.database.database import Task, User, create_db_and_tables, get_async_session
-from Task_Manager.src.config import Settings
-from Task_Manager.src.users import get_current_user
+from Task_Manager.src.database.batching import run_write, write_batcher
+from Task_Manager.src.database.database import get_async_session, get_read_session, log_sqlite_pragmas
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.tasks import TaskStatus, add_task, delete_task, etag_matches, get_archived_tasks_page, \
+    get_cache_headers, get_cached_tasks_page, get_task_counts, get_tasks_page, notify_task_changes, \
+    restore_archived_tasks, run_task_archiving, search_tasks, task_list_versions, toggle_task
+from Task_Manager.src.users import CachedUser, get_current_user
 
 
 logging.basicConfig(format='[%(asctime)s: %(levelname)s] %(message)s', filename="../log/db_logs", filemode='a')
@@ -19,38 +26,113 @@ logger.setLevel(level=logging.DEBUG)
 
 db_router = APIRouter()
 templates = Jinja2Templates(directory='./templates/task_manager')  # Указываем, где будут лежать наши HTML шаблоны
+background_tasks = set()  # Фоновые задачи приложения, которые отменяются при остановке
 
 
 @db_router.on_event("startup")
 async def on_startup():
     """
-        Создаем все таблицы на старте
+        Применяем недостающие миграции схемы БД на старте, записываем в лог фактические настройки SQLite и запускаем
+        периодический перенос завершенных задач в архив
     """
-    await create_db_and_tables()
+    await run_migrations()
+    await log_sqlite_pragmas()
+
+    archive_interval = get_settings().task_archive_interval
+    if archive_interval > 0:
+        background_tasks.add(asyncio.create_task(run_task_archiving(archive_interval)))
+
+
+@db_router.on_event("shutdown")
+async def on_shutdown():
+    """
+        Останавливаем фоновые задачи и дожидаемся фиксации изменений, которые еще находятся в очереди групповой
+        фиксации
+    """
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await write_batcher.close()
 
 
 @db_router.get("/tasks", name='tasks', response_class=HTMLResponse)
-async def tasks(request: Request, session: AsyncSession = Depends(get_async_session),
-                current_user: User = Depends(get_current_user)):
+async def tasks(request: Request, after: Optional[int] = None, limit: Optional[int] = Query(default=None, ge=1),
+                status: Optional[TaskStatus] = None, session: AsyncSession = Depends(get_read_session),
+                current_user: CachedUser = Depends(get_current_user)):
     """
-        Функция получает все созданные заявки и возвращает отрисованный HTML шаблон с данными заявками.
+        Функция получает страницу созданных заявок и возвращает отрисованный HTML шаблон с данными заявками.
 
         :param request: Обязательный параметр запроса для нашей странички по аналогии с Django
+        :param after: Курсор - id последней заявки предыдущей страницы
+        :param limit: Количество заявок на странице
+        :param status: Фильтр заявок по статусу (open - незавершенные, completed - завершенные)
         :param current_user: Текущий пользователь, под которого будут выведены созданные им заявки
-        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
+        :param session: Объект сессии из SQLAlchemy только для чтения. В нее передаются зависимости нашей базы данных.
+
+        :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates или 304 Not Modified, если
+            список задач не менялся с момента предыдущего запроса браузера
+    """
+    try:
+        headers = {}
+        version = task_list_versions.get(current_user.id)
+        if get_settings().task_list_cache_enabled:
+            headers = get_cache_headers(task_list_versions.etag(current_user.id, version))
+            if etag_matches(request.headers.get('if-none-match'), headers['ETag']):
+                return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+
+        page = await get_cached_tasks_page(session=session, user_id=current_user.id, version=version, after=after,
+                                           limit=limit, status=status)
+        task_counts = await get_task_counts(session=session, user_id=current_user.id)
+
+        return templates.TemplateResponse(
+            name="tasks.html",  # Путь до шаблона
+            context={'request': request,  # Context - данные, которые мы передаем в шаблон
+                     'app_name': get_settings().app_name,
+                     'tasks_list': page.tasks,
+                     'next_after': page.next_after,
+                     'task_counts': task_counts,
+                     'limit': limit,
+                     'status': status,
+                     'empty_field': False
+                     },
+            status_code=200,
+            headers=headers,
+        )
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@db_router.get("/search", name='search', response_class=HTMLResponse)
+async def search(request: Request, q: str = '', offset: int = Query(default=0, ge=0),
+                 limit: Optional[int] = Query(default=None, ge=1), session: AsyncSession = Depends(get_read_session),
+                 current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция ищет заявки текущего пользователя по словам из названия и возвращает отрисованный HTML шаблон с
+        найденными заявками, упорядоченными по релевантности.
+
+        :param request: Обязательный параметр запроса для нашей странички по аналогии с Django
+        :param q: Поисковый запрос
+        :param offset: Количество пропускаемых результатов
+        :param limit: Количество заявок на странице
+        :param session: Объект сессии из SQLAlchemy только для чтения. В нее передаются зависимости нашей базы данных.
+        :param current_user: Текущий пользователь, среди заявок которого выполняется поиск
 
         :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates
     """
     try:
-        async with session as async_session:
-            all_tasks = await async_session.execute(select(Task).filter(Task.user_id == current_user.id))
-            all_tasks = all_tasks.scalars()  # Переводим в скалярный вид для доступа к таскам и отрисовки в HTML
+        page = await search_tasks(session=session, user_id=current_user.id, query=q, offset=offset, limit=limit)
 
         return templates.TemplateResponse(
             name="tasks.html",  # Путь до шаблона
             context={'request': request,  # Context - данные, которые мы передаем в шаблон
-                     'app_name': Settings().app_name,
-                     'tasks_list': all_tasks,
+                     'app_name': get_settings().app_name,
+                     'tasks_list': page.tasks,
+                     'next_offset': page.next_offset,
+                     'search_query': q,
+                     'limit': limit,
                      'empty_field': False
                      },
             status_code=200,
@@ -61,10 +143,46 @@ async def tasks(request: Request, session: AsyncSession = Depends(get_async_sess
         raise HTTPException(status_code=500, detail="Something went wrong")
 
 
+@db_router.get("/archive", name='archive', response_class=HTMLResponse)
+async def archive(request: Request, after: Optional[int] = None, limit: Optional[int] = Query(default=None, ge=1),
+                  session: AsyncSession = Depends(get_read_session),
+                  current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция получает страницу архива заявок - давно завершенных заявок, перенесенных из списка заявок, и
+        возвращает отрисованный HTML шаблон с данными заявками.
+
+        :param request: Обязательный параметр запроса для нашей странички по аналогии с Django
+        :param after: Курсор - id последней записи архива предыдущей страницы
+        :param limit: Количество заявок на странице
+        :param session: Объект сессии из SQLAlchemy только для чтения. В нее передаются зависимости нашей базы данных.
+        :param current_user: Текущий пользователь, архив которого выводится
+
+        :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates
+    """
+    try:
+        page = await get_archived_tasks_page(session=session, user_id=current_user.id, after=after, limit=limit)
+
+        return templates.TemplateResponse(
+            name="archive.html",  # Путь до шаблона
+            context={'request': request,  # Context - данные, которые мы передаем в шаблон
+                     'app_name': get_settings().app_name,
+                     'tasks_list': page.tasks,
+                     'next_after': page.next_after,
+                     'limit': limit,
+                     },
+            status_code=200,
+        )
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
 @db_router.post("/add", name='add', response_class=RedirectResponse)
 async def add(request: Request, title: str = Form(default=None, description="Укажите описание заявки"),
               session: AsyncSession = Depends(get_async_session),
-              current_user: User = Depends(get_current_user)):
+              read_session: AsyncSession = Depends(get_read_session),
+              current_user: CachedUser = Depends(get_current_user)):
     """
         Функция получает название новой заявки, создает экземпляр модели заявки и сохраняет заявку в базу данных.
         Переадресовывает на домашнюю страницу.
@@ -72,30 +190,29 @@ async def add(request: Request, title: str = Form(default=None, description="У
         :param request: Обязательный параметр запроса для нашей странички по аналогии с Django
         :param title: Обязательный параметр формы, для создания новой заявки
         :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
+        :param read_session: Объект сессии из SQLAlchemy только для чтения. Через нее читается список заявок, если
+            заявка не создается, чтобы чтение не занимало единственное соединение-писатель до конца запроса
         :param current_user: Текущий пользователь, под которого будут выведены созданные им заявки
 
         :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates
     """
     try:
         if not title:
-            async with session as async_session:
-                all_tasks = await async_session.execute(select(Task).filter(Task.user_id == current_user.id))
-                all_tasks = all_tasks.scalars()
+            page = await get_tasks_page(session=read_session, user_id=current_user.id)
 
             return templates.TemplateResponse(
                 name="tasks.html",  # Путь до шаблона
                 context={'request': request,  # Context - данные, которые мы передаем в шаблон
-                         'app_name': Settings().app_name,
-                         'tasks_list': all_tasks,
+                         'app_name': get_settings().app_name,
+                         'tasks_list': page.tasks,
+                         'next_after': page.next_after,
                          'empty_field': True
                          },
                 status_code=200,
             )
 
-        new_task = Task(title=title, user_id=current_user.id)
-        async with session as async_session:
-            async_session.add(new_task)
-            await async_session.commit()
+        task = await run_write(session, lambda write_session: add_task(write_session, current_user.id, title))
+        notify_task_changes(current_user.id, 'created', tasks=[task.dict()])  # Обновляем другие вкладки и устройства
 
         home_url = db_router.url_path_for('tasks')
         return RedirectResponse(url=home_url, status_code=HTTP_303_SEE_OTHER)
@@ -107,10 +224,10 @@ async def add(request: Request, title: str = Form(default=None, description="У
 
 @db_router.get('/update/{task_id}', name='update', response_class=RedirectResponse)
 async def update(task_id: int, session: AsyncSession = Depends(get_async_session),
-                 current_user: User = Depends(get_current_user)):
+                 current_user: CachedUser = Depends(get_current_user)):
     """
-        Функция получает идентификационный номер заявки, находит ее и меняет статус на противоположный от того,
-        который был.
+        Функция получает идентификационный номер заявки и одним запросом к БД меняет статус заявки текущего
+        пользователя на противоположный от того, который был.
 
         :param task_id: Идентификационный номер заявки для редактирования
         :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
@@ -119,23 +236,22 @@ async def update(task_id: int, session: AsyncSession = Depends(get_async_session
         :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates
     """
     try:
-        async with session as async_session:
-            task_to_update = await async_session.execute(select(Task).filter(Task.id == task_id))
-            task_to_update = task_to_update.scalar()
+        task = await run_write(session, lambda write_session: toggle_task(write_session, current_user.id, task_id))
 
-            # Проверка, что таска принадлежит текущему пользователю:
-            if not task_to_update.user_id == current_user.id:
-                logger.debug(f'User with id={current_user.id} tried to update task with id={task_id}, which does not '
-                             f'belongs to him!')
-                raise HTTPException(status_code=404, detail="You are not allowed to change other user's tasks!")
-
-            task_to_update.is_complete = not task_to_update.is_complete
-            await async_session.commit()
+        # Задачи нет или она принадлежит другому пользователю:
+        if task is None:
+            logger.debug(f'User with id={current_user.id} tried to update task with id={task_id}, which does not '
+                         f'exist or does not belong to him!')
+            raise HTTPException(status_code=404, detail="Task not found")
 
+        notify_task_changes(current_user.id, 'updated', tasks=[task.dict()])
         url = db_router.url_path_for('tasks')
 
         return RedirectResponse(url=url, status_code=HTTP_302_FOUND)
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.debug(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
@@ -143,9 +259,9 @@ async def update(task_id: int, session: AsyncSession = Depends(get_async_session
 
 @db_router.get('/delete/{task_id}', name='delete', response_class=RedirectResponse)
 async def delete(task_id: int, session: AsyncSession = Depends(get_async_session),
-                 current_user: User = Depends(get_current_user)):
+                 current_user: CachedUser = Depends(get_current_user)):
     """
-        Функция получает идентификационный номер заявки, находит ее и удаляет.
+        Функция получает идентификационный номер заявки и одним запросом к БД удаляет заявку текущего пользователя.
 
         :param task_id: Идентификационный номер заявки для редактирования
         :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
@@ -154,22 +270,56 @@ async def delete(task_id: int, session: AsyncSession = Depends(get_async_session
         :return: Отрисованный HTML, созданный с помощью шаблонизатора Jinja2Templates
     """
     try:
-        async with session as async_session:
-            task_to_delete = await async_session.execute(select(Task).filter_by(id=task_id))
-            task_to_delete = task_to_delete.scalar()
+        deleted = await run_write(session, lambda write_session: delete_task(write_session, current_user.id, task_id))
 
-            # Проверка, что таска принадлежит текущему пользователю:
-            if not task_to_delete.user_id == current_user.id:
-                logger.debug(f'User with id={current_user.id} tried to delete task with id={task_id}, which does not '
-                             f'belongs to him!')
-                raise HTTPException(status_code=404, detail="You are not allowed to delete other user's tasks!")
-
-            await async_session.delete(task_to_delete)
-            await async_session.commit()
+        # Задачи нет или она принадлежит другому пользователю:
+        if not deleted:
+            logger.debug(f'User with id={current_user.id} tried to delete task with id={task_id}, which does not '
+                         f'exist or does not belong to him!')
+            raise HTTPException(status_code=404, detail="Task not found")
 
+        notify_task_changes(current_user.id, 'deleted', ids=[task_id])
         url = db_router.url_path_for('tasks')
         return RedirectResponse(url=url, status_code=HTTP_302_FOUND)
 
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@db_router.get('/restore/{archive_id}', name='restore', response_class=RedirectResponse)
+async def restore(archive_id: int, session: AsyncSession = Depends(get_async_session),
+                  current_user: CachedUser = Depends(get_current_user)):
+    """
+        Функция получает идентификационный номер заявки из архива и возвращает заявку текущего пользователя в список
+        заявок. Переадресовывает на страницу архива.
+
+        :param archive_id: Идентификационный номер записи архива
+        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
+        :param current_user: Текущий пользователь, под которого будут выведены созданные им заявки
+
+        :return: Переадресация на страницу архива
+    """
+    try:
+        result = await run_write(session, lambda write_session: restore_archived_tasks(write_session, current_user.id,
+                                                                                       [archive_id]))
+
+        # Заявки нет в архиве или она принадлежит другому пользователю:
+        if not result.tasks:
+            logger.debug(f'User with id={current_user.id} tried to restore archive record with id={archive_id}, which '
+                         f'does not exist or does not belong to him!')
+            raise HTTPException(status_code=404, detail="Task not found")
+
+        notify_task_changes(current_user.id, 'created', tasks=[task.dict() for task in result.tasks])
+        url = db_router.url_path_for('archive')
+        return RedirectResponse(url=url, status_code=HTTP_302_FOUND)
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.debug(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
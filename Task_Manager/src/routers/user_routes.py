@@ -1,16 +1,25 @@
+import asyncio
 import logging
+import math
 
-from fastapi import Request, Form, HTTPException, APIRouter
+from fastapi import Request, Form, Depends, HTTPException, APIRouter
 from fastapi.responses import HTMLResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.background import BackgroundTask
 from starlette.responses import RedirectResponse
-from starlette.status import HTTP_303_SEE_OTHER
+from starlette.status import HTTP_303_SEE_OTHER, HTTP_429_TOO_MANY_REQUESTS
 from starlette.templating import Jinja2Templates
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from Task_Manager.src.config import Settings
-from Task_Manager.src.users.utils import get_user_by_email, create_user, validate_password, \
-    create_user_token
-from Task_Manager.src.users.models import RegisterUser
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import get_async_session, get_read_session
+from Task_Manager.src.users.utils import get_user_by_email, create_user, issue_access_token, revoke_user_token, \
+    run_token_sweeper, rehash_user_password, deactivate_user, get_current_user
+from Task_Manager.src.users.hashing import password_hasher, password_needs_rehash, PasswordHasherBusy
+from Task_Manager.src.users.throttling import email_login_limiter, ip_login_limiter
+from Task_Manager.src.users.models import CachedUser, RegisterUser
+from Task_Manager.src.users.pages import StaticPages
 
 
 logging.basicConfig(format='[%(asctime)s: %(levelname)s] %(message)s', filename='./log/user_logs', filemode='a')
@@ -20,83 +29,136 @@ logger.setLevel(level=logging.DEBUG)
 user_router = APIRouter()
 templates = Jinja2Templates(directory='./templates/task_manager')  # Указываем, где будут лежать наши HTML шаблоны
 
+# Страницы без данных пользователя отрисовываются один раз и заново только после изменения шаблонов:
+static_pages = StaticPages(templates=templates, check_interval=get_settings().static_pages_check_interval,
+                           max_age=get_settings().static_pages_max_age)
+
+# Варианты этих страниц (имя шаблона и флаги), которые отрисовываются на старте приложения:
+STATIC_PAGE_VARIANTS = (
+    ('start_page.html', {}),
+    ('login.html', {}),
+    ('login.html', {'empty_creds': True}),
+    ('login.html', {'incorrect_creds': True}),
+    ('register.html', {}),
+    ('register.html', {'empty_creds': True}),
+    ('register.html', {'user_exists': True}),
+)
+
+
+background_tasks = set()  # Ссылки на фоновые задачи, чтобы их не удалил сборщик мусора
+
+
+@user_router.on_event("startup")
+async def on_startup():
+    """
+        Запускаем фоновое удаление просроченных токенов на старте
+    """
+    if get_settings().token_mode == 'database':
+        background_tasks.add(asyncio.create_task(run_token_sweeper()))
+
+
+@user_router.on_event("shutdown")
+async def on_shutdown():
+    """
+        Останавливаем фоновые задачи и пул хеширования паролей при остановке приложения
+    """
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    password_hasher.shutdown()
+
+
+def check_login_admission(request: Request, email: str) -> None:
+    """
+        Проверяет, что попытку входа можно обработать: не превышены лимиты попыток для email и IP-адреса клиента и
+        пул хеширования паролей не перегружен. Иначе выбрасывает HTTPException с кодом 429 до вычисления хеша.
+
+        :param request: Базовый запрос
+        :param email: Email пользователя
+    """
+    retry_after = max(email_login_limiter.hit(email.lower()),
+                      ip_login_limiter.hit(request.client.host if request.client else ''))
+    if retry_after:
+        logger.debug(f'Login attempt for email={email} was throttled')
+        raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS, detail="Too many login attempts",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+    if password_hasher.is_busy():
+        raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS, detail="Too many login attempts",
+                            headers={"Retry-After": "1"})
+
 
 @user_router.post("/auth", name='auth', response_class=Optional[RedirectResponse | HTMLResponse])
-async def auth(request: Request, email: str = Form(default=None), password: str = Form(default=None)):
+async def auth(request: Request, email: str = Form(default=None), password: str = Form(default=None),
+               read_session: AsyncSession = Depends(get_read_session),
+               session: AsyncSession = Depends(get_async_session)):
     """
         Функция получает email и пароль пользователя и проверяет, зарегистрирован ли пользователь с таким email-ом.
         Если пользователь зарегистрирован, идет проверка валидности введенного пароля.
         Если пароль валидный, то создается токен для данного юзера, сохраняется в БД и добавляется в cookies ответа
-        RedirectResponse, который перенаправляет пользователя на страницу с его задачами.
+        RedirectResponse, который перенаправляет пользователя на страницу с его задачами. Если хеш пароля был получен
+        с устаревшими настройками хеширования, после ответа он пересчитывается с текущими.
+
+        До проверки пароля ограничивается частота попыток входа для email и IP-адреса клиента, а также проверяется
+        загрузка пула хеширования. При превышении лимитов запрос сразу отклоняется с кодом 429.
 
         :param request: Базовый запрос
         :param email: Email пользователя
         :param password: Пароль пользователя
+        :param read_session: Сессия только для чтения для поиска пользователя
+        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
 
         :return: RedirectResponse на страницу с задачами текущего пользователя
     """
     try:
         if not email or not password:
-            return templates.TemplateResponse(
-                name="login.html",
-                context={'request': request,
-                         'app_name': Settings().app_name,
-                         'incorrect_creds': False,
-                         'empty_creds': True
-                         },
-                status_code=200,
-            )
-
-        user = await get_user_by_email(email=email)
+            return static_pages.response(request=request, name="login.html", cacheable=False, empty_creds=True)
+
+        check_login_admission(request=request, email=email)
+
+        user = await get_user_by_email(session=read_session, email=email)
         if not user:
-            return templates.TemplateResponse(
-                name="login.html",
-                context={'request': request,
-                         'app_name': Settings().app_name,
-                         'incorrect_creds': True,
-                         'empty_creds': False
-                         },
-                status_code=200,
-            )
-
-        if not validate_password(password=password, hashed_password=user.hashed_password):
-            return templates.TemplateResponse(
-                name="login.html",
-                context={'request': request,
-                         'app_name': Settings().app_name,
-                         'incorrect_creds': True,
-                         'empty_creds': False
-                         },
-                status_code=200,
-            )
-
-        token = await create_user_token(user_id=user.id)
+            return static_pages.response(request=request, name="login.html", cacheable=False, incorrect_creds=True)
+
+        if not await password_hasher.validate_password(password=password, hashed_password=user.hashed_password):
+            return static_pages.response(request=request, name="login.html", cacheable=False, incorrect_creds=True)
+
+        token = await issue_access_token(session=session, user=user)
+        # Сессия зависимости закрывается только после фоновых задач ответа. Освобождаем соединение-писатель сразу,
+        # чтобы пересчет хеша пароля после ответа не ждал его до истечения db_pool_timeout:
+        await session.close()
 
         login_url = '/tasks'
         response = RedirectResponse(url=login_url, status_code=HTTP_303_SEE_OTHER)
-        response.set_cookie(key="access_token", value=f"Bearer {token.token}", httponly=True)
+        response.set_cookie(key="access_token", value=f"Bearer {token}", httponly=True)
+
+        # Пересчитываем хеш пароля уже после отправки ответа, если изменились настройки хеширования:
+        if password_needs_rehash(user.hashed_password):
+            response.background = BackgroundTask(rehash_user_password, user_id=user.id, password=password)
         return response
 
+    except PasswordHasherBusy as e:
+        logger.debug(e)
+        raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS, detail="Too many login attempts",
+                            headers={"Retry-After": "1"})
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.debug(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
 
 
 @user_router.get('/', name='start', response_class=HTMLResponse)
-def start_page(request: Request):
+async def start_page(request: Request):
     """
         :param request: Стандартный запрос
 
-        :return: Отрисованный HTML шаблон со стартовой страницей для авторизации или регистрации
+        :return: Заранее отрисованная стартовая страница для авторизации или регистрации или 304 Not Modified
     """
     try:
-        return templates.TemplateResponse(
-            name="start_page.html",  # Путь до шаблона
-            context={'request': request,  # Context - данные, которые мы передаем в шаблон
-                     'app_name': Settings().app_name,
-                     },
-            status_code=200,
-        )
+        return static_pages.response(request=request, name="start_page.html")
 
     except Exception as e:
         logger.debug(e)
@@ -104,13 +166,45 @@ def start_page(request: Request):
 
 
 @user_router.get('/logout', name='logout', response_class=RedirectResponse)
-def logout():
+async def logout(request: Request, session: AsyncSession = Depends(get_async_session)):
+    """
+        Функция стирает cookies, отзывает токен пользователя и переадресовывает юзера на стартовую страницу.
+
+        :param request: Стандартный запрос
+        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
+
+        :return: RedirectResponse на стартовую страницу
+    """
+    try:
+        _, token = get_authorization_scheme_param(request.cookies.get("access_token"))
+        if token:
+            await revoke_user_token(session=session, token=token)
+
+        redirect_url = user_router.url_path_for('start')
+        response = RedirectResponse(url=redirect_url, status_code=HTTP_303_SEE_OTHER)
+        response.delete_cookie(key="access_token", httponly=True)
+        return response
+
+    except Exception as e:
+        logger.debug(e)
+        raise HTTPException(status_code=500, detail="Something went wrong")
+
+
+@user_router.post('/deactivate', name='deactivate', response_class=RedirectResponse)
+async def deactivate(session: AsyncSession = Depends(get_async_session),
+                     current_user: CachedUser = Depends(get_current_user)):
     """
-        Функция стирает cookies и переадресовывает юзера на стартовую страницу.
+        Функция деактивирует аккаунт текущего пользователя. Все его токены перестают действовать сразу же, в том числе
+        уже сохраненные в кэше токенов. Стирает cookies и переадресовывает юзера на стартовую страницу.
+
+        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
+        :param current_user: Текущий пользователь, аккаунт которого деактивируется
 
         :return: RedirectResponse на стартовую страницу
     """
     try:
+        await deactivate_user(session=session, user_id=current_user.id)
+
         redirect_url = user_router.url_path_for('start')
         response = RedirectResponse(url=redirect_url, status_code=HTTP_303_SEE_OTHER)
         response.delete_cookie(key="access_token", httponly=True)
@@ -122,22 +216,14 @@ def logout():
 
 
 @user_router.get('/login', name='login', response_class=HTMLResponse)
-def login(request: Request):
+async def login(request: Request):
     """
         :param request: Стандартный запрос
 
-        :return: Отрисованный HTML шаблон с формой для авторизации
+        :return: Заранее отрисованная страница с формой для авторизации или 304 Not Modified
     """
     try:
-        return templates.TemplateResponse(
-            name="login.html",
-            context={'request': request,
-                     'app_name': Settings().app_name,
-                     'incorrect_creds': False,
-                     'empty_creds': False
-                     },
-            status_code=200,
-        )
+        return static_pages.response(request=request, name="login.html")
 
     except Exception as e:
         logger.debug(e)
@@ -145,22 +231,14 @@ def login(request: Request):
 
 
 @user_router.get('/register', name='register', response_class=HTMLResponse)
-def register(request: Request):
+async def register(request: Request):
     """
         :param request: Стандартный запрос
 
-        :return: Отрисованный HTML шаблон с формой для регистрации
+        :return: Заранее отрисованная страница с формой для регистрации или 304 Not Modified
     """
     try:
-        return templates.TemplateResponse(
-            name="register.html",
-            context={'request': request,
-                     'app_name': Settings().app_name,
-                     'user_exists': False,
-                     'empty_creds': False
-                     },
-            status_code=200,
-        )
+        return static_pages.response(request=request, name="register.html")
 
     except Exception as e:
         logger.debug(e)
@@ -169,7 +247,8 @@ def register(request: Request):
 
 @user_router.post("/process_register", response_class=Optional[RedirectResponse | HTMLResponse])
 async def process_register(request: Request, email=Form(default=None), username=Form(default=None),
-                           password=Form(default=None)):
+                           password=Form(default=None), read_session: AsyncSession = Depends(get_read_session),
+                           session: AsyncSession = Depends(get_async_session)):
     """
         Функция обрабатывает входящие данные из HTML формы и создает пользователя в БД, если пользователя с таким же
         адресом электронной почты еще не зарегистрировано, после чего перенаправляет пользователя на страницу
@@ -179,40 +258,31 @@ async def process_register(request: Request, email=Form(default=None), username=
         :param email: Адрес электронной почты из HTML формы
         :param username: Имя пользователя из HTML формы
         :param password: Пароль из HTML формы
+        :param read_session: Сессия только для чтения для проверки, что email еще не занят
+        :param session: Объект сессии из SQLAlchemy. В нее передаются зависимости нашей базы данных.
 
         :return: RedirectResponse на страницу для авторизации (login)
     """
     try:
         if not email or not password or not username:
-            return templates.TemplateResponse(
-                name="register.html",
-                context={'request': request,
-                         'app_name': Settings().app_name,
-                         'user_exists': False,
-                         'empty_creds': True
-                         },
-                status_code=200,
-            )
-
-        db_user = await get_user_by_email(email=email)
+            return static_pages.response(request=request, name="register.html", cacheable=False, empty_creds=True)
+
+        db_user = await get_user_by_email(session=read_session, email=email)
         if db_user:
             logger.debug(f'User tried to register with email={email}, but user with those email is already exists!')
-            return templates.TemplateResponse(
-                name="register.html",
-                context={'request': request,
-                         'app_name': Settings().app_name,
-                         'user_exists': True,
-                         'empty_creds': False
-                         },
-                status_code=200,
-            )
+            return static_pages.response(request=request, name="register.html", cacheable=False, user_exists=True)
 
         user = RegisterUser(email=email, password=password, username=username)
-        await create_user(user=user)
+        await create_user(session=session, user=user)
 
         login_url = user_router.url_path_for('login')
         return RedirectResponse(url=login_url, status_code=HTTP_303_SEE_OTHER)
 
+    except PasswordHasherBusy as e:
+        logger.debug(e)
+        raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS, detail="Too many registration attempts",
+                            headers={"Retry-After": "1"})
+
     except Exception as e:
         logger.debug(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
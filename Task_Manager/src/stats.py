@@ -0,0 +1,42 @@
+import asyncio
+import logging
+
+from typing import Dict
+
+from Task_Manager.src.database.batching import write_batcher
+from Task_Manager.src.tasks.cache import task_page_cache
+from Task_Manager.src.tasks.events import task_event_broker
+from Task_Manager.src.users.cache import token_cache
+from Task_Manager.src.users.hashing import password_hasher
+
+
+logger = logging.getLogger("")
+
+
+def collect_stats() -> Dict[str, Dict[str, float]]:
+    """
+        Собирает счетчики кэшей и очередей приложения, по которым подбираются их размеры.
+    """
+    return {
+        'token_cache': token_cache.stats(),
+        'password_hasher': password_hasher.stats(),
+        'write_batcher': write_batcher.stats(),
+        'task_page_cache': task_page_cache.stats(),
+        'task_event_broker': task_event_broker.stats(),
+    }
+
+
+async def run_stats_logging(interval: float) -> None:
+    """
+        Периодически записывает счетчики приложения в лог. Запускается фоновой задачей на старте приложения и
+        отменяется при остановке.
+
+        :param interval: Интервал между записями (в секундах)
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for name, stats in collect_stats().items():
+                logger.info(f'{name}: ' + ', '.join(f'{key}={value}' for key, value in stats.items()))
+        except Exception as e:
+            logger.debug(e)
@@ -0,0 +1,8 @@
+from .archive import *
+from .cache import *
+from .events import *
+from .export import *
+from .importing import *
+from .models import *
+from .summary import *
+from .utils import *
@@ -0,0 +1,176 @@
+import asyncio
+import datetime
+import logging
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Task, TaskArchive, async_session_maker
+from .events import notify_task_changes
+from .models import ArchivedTaskPage, ArchivedTaskRead, TaskRead, TaskRestoreResult
+from .utils import get_bulk_results, get_page_size
+
+
+logger = logging.getLogger("")
+
+
+async def get_archived_tasks_page(session: AsyncSession, user_id: int, after: Optional[int] = None,
+                                  limit: Optional[int] = None) -> ArchivedTaskPage:
+    """
+        Возвращает страницу архива задач пользователя, упорядоченных по id записи архива (в порядке архивации), с
+        курсорной пагинацией по индексу ix_task_archive_user_id_id.
+
+        :param session: Сессия для чтения
+        :param user_id: Идентификатор пользователя, архив которого выбирается
+        :param after: Курсор - id последней записи архива предыдущей страницы
+        :param limit: Размер страницы
+        :return: Страница архива и курсор следующей страницы
+    """
+    page_size = get_page_size(limit)
+
+    query = select(TaskArchive).filter(TaskArchive.user_id == user_id)
+    if after is not None:
+        query = query.filter(TaskArchive.id > after)
+
+    tasks = await session.execute(query.order_by(TaskArchive.id).limit(page_size + 1))
+    tasks = tasks.scalars().all()
+
+    next_after = tasks[page_size - 1].id if len(tasks) > page_size else None
+    return ArchivedTaskPage(tasks=[ArchivedTaskRead.from_orm(task) for task in tasks[:page_size]],
+                            next_after=next_after)
+
+
+async def archive_task_batch(session: AsyncSession, completed_before: datetime.datetime,
+                             batch_size: int) -> Dict[int, List[int]]:
+    """
+        Переносит в архив не больше batch_size задач, завершенных раньше completed_before: копирует их в task_archive
+        и удаляет из task. Задачи выбираются по индексу ix_task_completed_at. Счетчики задач и полнотекстовый индекс
+        обновляются триггерами на удаление. Изменения не фиксируются, commit выполняет вызывающий.
+
+        :return: id перенесенных задач по пользователям
+    """
+    batch = await session.execute(
+        select(Task.id, Task.user_id)
+        .filter(Task.completed_at < completed_before, Task.is_complete == True)  # noqa: E712
+        .order_by(Task.completed_at)
+        .limit(batch_size)
+    )
+    batch = batch.all()
+    if not batch:
+        return {}
+
+    task_ids = [task.id for task in batch]
+    await session.execute(
+        insert(TaskArchive).from_select(
+            ['task_id', 'user_id', 'title', 'completed_at', 'archived_at'],
+            select(Task.id, Task.user_id, Task.title, Task.completed_at,
+                   literal(datetime.datetime.utcnow(), TaskArchive.archived_at.type))
+            .filter(Task.id.in_(task_ids))
+        )
+    )
+    await session.execute(delete(Task).where(Task.id.in_(task_ids)).execution_options(synchronize_session=False))
+
+    archived: Dict[int, List[int]] = {}
+    for task in batch:
+        archived.setdefault(task.user_id, []).append(task.id)
+    return archived
+
+
+async def archive_completed_tasks(session_maker: async_sessionmaker = async_session_maker,
+                                  older_than: Optional[datetime.timedelta] = None,
+                                  batch_size: Optional[int] = None) -> int:
+    """
+        Переносит в архив все задачи, завершенные раньше, чем older_than назад. Каждая порция из batch_size задач
+        переносится отдельной транзакцией, поэтому запись в БД не блокируется на все время архивации. Пользователи,
+        задачи которых перенесены, получают событие об удалении задач из списка.
+
+        :param session_maker: Фабрика сессий для записи
+        :param older_than: Сколько времени должно пройти после завершения задачи (по умолчанию из настроек)
+        :param batch_size: Количество задач в одной транзакции (по умолчанию из настроек)
+        :return: Количество перенесенных задач
+    """
+    settings = get_settings()
+    if older_than is None:
+        older_than = datetime.timedelta(days=settings.task_archive_after_days)
+    batch_size = batch_size or settings.task_archive_batch_size
+    completed_before = datetime.datetime.utcnow() - older_than
+
+    total = 0
+    while True:
+        async with session_maker() as session:
+            archived = await archive_task_batch(session, completed_before=completed_before, batch_size=batch_size)
+            await session.commit()
+
+        for user_id, task_ids in archived.items():
+            if user_id is not None:
+                notify_task_changes(user_id, 'deleted', ids=task_ids)
+
+        archived_count = sum(len(task_ids) for task_ids in archived.values())
+        total += archived_count
+        if archived_count < batch_size:
+            break
+        await asyncio.sleep(0)  # Даем выполниться запросам, ожидающим соединение-писатель
+
+    if total:
+        logger.info(f'Archived {total} completed tasks')
+    return total
+
+
+async def run_task_archiving(interval: float) -> None:
+    """
+        Периодически переносит давно завершенные задачи в архив. Запускается фоновой задачей на старте приложения
+        и отменяется при остановке. Ошибка архивации записывается в лог и не останавливает следующие запуски.
+
+        :param interval: Интервал между запусками (в секундах)
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await archive_completed_tasks()
+        except Exception as e:
+            logger.debug(e)
+
+
+async def restore_archived_tasks(session: AsyncSession, user_id: int, archive_ids: List[int]) -> TaskRestoreResult:
+    """
+        Возвращает задачи пользователя из архива в task как завершенные, с новым временем завершения, чтобы они не
+        были сразу перенесены в архив снова. Задача сохраняет свой id, если он не занят другой задачей, в том числе
+        восстановленной тем же запросом. Изменения не фиксируются, commit выполняет вызывающий.
+
+        :param archive_ids: id записей архива
+        :return: Результаты в порядке id записей из запроса и восстановленные задачи
+    """
+    archived = await session.execute(select(TaskArchive.id, TaskArchive.task_id, TaskArchive.title)
+                                     .filter(TaskArchive.user_id == user_id, TaskArchive.id.in_(set(archive_ids)))
+                                     .order_by(TaskArchive.id))
+    archived = archived.all()
+    if not archived:
+        return TaskRestoreResult(results=get_bulk_results(archive_ids, set()), tasks=[])
+
+    taken = await session.execute(select(Task.id).filter(Task.id.in_({task.task_id for task in archived})))
+    taken = set(taken.scalars().all())
+
+    # Задачи с занятым id вставляются последними и получают id больше всех существующих, поэтому не занимают id
+    # задач, восстанавливаемых тем же запросом:
+    completed_at = datetime.datetime.utcnow()
+    values = []
+    for task in archived:
+        task_id = task.task_id if task.task_id not in taken else None
+        taken.add(task.task_id)
+        values.append({'id': task_id, 'user_id': user_id, 'title': task.title, 'is_complete': True,
+                       'completed_at': completed_at})
+
+    restored = await session.execute(
+        insert(Task).values(sorted(values, key=lambda task: task['id'] is None))
+        .returning(Task.id, Task.title, Task.is_complete)
+    )
+    tasks = sorted((TaskRead.from_orm(task) for task in restored.all()), key=lambda task: task.id)
+
+    restored_ids = {task.id for task in archived}
+    await session.execute(delete(TaskArchive).where(TaskArchive.id.in_(restored_ids))
+                          .execution_options(synchronize_session=False))
+    return TaskRestoreResult(results=get_bulk_results(archive_ids, restored_ids), tasks=tasks)
@@ -0,0 +1,146 @@
+import itertools
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Task_Manager.src.config import get_settings
+from .models import TaskPage, TaskStatus
+from .utils import get_page_size, get_tasks_page
+
+
+class TaskListVersions:
+    """
+        Версии списков задач пользователей. Версия меняется после каждого зафиксированного изменения задач
+        пользователя и используется как ETag страницы списка и как часть ключа кэша страниц.
+
+        Версии берутся из общего для процесса возрастающего счетчика, поэтому пользователь, вытесненный из
+        ограниченного по размеру словаря, при следующем обращении получает новую версию, а не одну из уже выданных.
+        Идентификатор запуска в ETag делает недействительными ETag, выданные до перезапуска приложения.
+
+        Версии хранятся в памяти процесса: при запуске нескольких процессов кэш необходимо отключить.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.boot_id = uuid4().hex[:8]
+        self._versions: OrderedDict[int, int] = OrderedDict()
+        self._counter = itertools.count(1)
+
+    def get(self, user_id: int) -> int:
+        """
+            Возвращает текущую версию списка задач пользователя.
+        """
+        version = self._versions.get(user_id)
+        if version is None:
+            return self.bump(user_id)
+
+        self._versions.move_to_end(user_id)
+        return version
+
+    def bump(self, user_id: int) -> int:
+        """
+            Меняет версию списка задач пользователя. Вызывается после фиксации изменений, чтобы чтение,
+            начавшееся до фиксации, не сохранило в кэш старые данные под новой версией.
+        """
+        version = self._versions[user_id] = next(self._counter)
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_size:
+            self._versions.popitem(last=False)
+        return version
+
+    def etag(self, user_id: int, version: int) -> str:
+        """
+            Возвращает строгий ETag списка задач пользователя для указанной версии.
+        """
+        return f'"{self.boot_id}-{user_id}-{version}"'
+
+
+class TaskPageCache:
+    """
+        Ограниченный по размеру LRU кэш страниц списка задач. Страница хранится вместе с версией списка, для
+        которой она была выбрана, и возвращается, только если версия не изменилась.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._pages: OrderedDict[Tuple, Tuple[int, TaskPage]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple, version: int) -> Optional[TaskPage]:
+        """
+            Возвращает страницу по ключу запроса, если она была выбрана для текущей версии списка.
+        """
+        entry = self._pages.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Tuple, version: int, page: TaskPage) -> None:
+        """
+            Сохраняет страницу для указанной версии списка.
+        """
+        if self.max_size <= 0:
+            return
+
+        self._pages[key] = (version, page)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Возвращает счетчики кэша страниц.
+        """
+        return {
+            'size': len(self._pages),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+task_list_versions = TaskListVersions(max_size=get_settings().task_list_cache_users)
+task_page_cache = TaskPageCache(max_size=get_settings().task_list_cache_size)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+        Проверяет, что ETag из заголовка If-None-Match совпадает с текущим.
+    """
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+
+def get_cache_headers(etag: str) -> Dict[str, str]:
+    """
+        Заголовки ответа со списком задач: браузер может хранить ответ, но перед каждым использованием должен
+        проверить его ETag. Ответ зависит от пользователя, поэтому разделяемым кэшам хранить его нельзя.
+    """
+    return {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Cookie, Authorization'}
+
+
+async def get_cached_tasks_page(session: AsyncSession, user_id: int, version: int, after: Optional[int] = None,
+                                limit: Optional[int] = None, status: Optional[TaskStatus] = None) -> TaskPage:
+    """
+        Возвращает страницу задач пользователя из кэша, если она выбиралась для текущей версии списка, иначе выбирает
+        ее из БД и сохраняет в кэш.
+
+        :param version: Версия списка задач, полученная до обращения к БД
+    """
+    if not get_settings().task_list_cache_enabled:
+        return await get_tasks_page(session=session, user_id=user_id, after=after, limit=limit, status=status)
+
+    key = (user_id, after, get_page_size(limit), status)
+    page = task_page_cache.get(key, version)
+    if page is None:
+        page = await get_tasks_page(session=session, user_id=user_id, after=after, limit=limit, status=status)
+        task_page_cache.set(key, version, page)
+    return page
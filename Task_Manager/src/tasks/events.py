@@ -0,0 +1,175 @@
+import asyncio
+
+from typing import Any, AsyncIterator, Dict, Optional
+
+import orjson
+
+from Task_Manager.src.config import get_settings
+from .cache import task_list_versions
+
+
+class Subscription:
+    """
+        Подписка клиента на изменения задач пользователя с собственной ограниченной очередью событий. Значение None в
+        очереди означает, что подписка закрыта (например, клиент не успевал забирать события) и клиенту необходимо
+        заново загрузить список задач.
+    """
+    def __init__(self, user_id: int, max_queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size + 1)  # Место для None при закрытии
+        self.max_queue_size = max_queue_size
+        self.closed = False
+
+    def put(self, event: Dict[str, Any]) -> bool:
+        """
+            Кладет событие в очередь подписки.
+
+            :return: False, если очередь заполнена и событие не помещается
+        """
+        if self.closed or self.queue.qsize() >= self.max_queue_size:
+            return False
+        self.queue.put_nowait(event)
+        return True
+
+    def close(self) -> None:
+        """
+            Закрывает подписку: недоставленные события отбрасываются, клиент получает признак закрытия.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """
+            Ждет следующее событие. None означает, что подписка закрыта.
+        """
+        return await self.queue.get()
+
+
+class TaskEventBroker:
+    """
+        Рассылка событий об изменении задач подписчикам внутри процесса (вкладкам и устройствам пользователя,
+        подключенным через SSE или WebSocket).
+
+        Публикация не ждет подписчиков: событие кладется в очередь каждой подписки без ожидания. Подписчик, очередь
+        которого заполнена (клиент не успевает забирать события), отключается, чтобы медленный клиент не
+        увеличивал расход памяти и не задерживал остальных. Количество подписок одного пользователя ограничено,
+        при превышении закрывается самая старая.
+
+        События хранятся в памяти процесса: при запуске нескольких процессов клиент получает только изменения,
+        выполненные тем же процессом.
+    """
+    def __init__(self, max_queue_size: int, max_subscriptions_per_user: int):
+        self.max_queue_size = max_queue_size
+        self.max_subscriptions_per_user = max_subscriptions_per_user
+        self._subscriptions: Dict[int, Dict[Subscription, None]] = {}  # Словарь сохраняет порядок подписки
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """
+            Создает подписку на изменения задач пользователя.
+        """
+        subscription = Subscription(user_id=user_id, max_queue_size=self.max_queue_size)
+        user_subscriptions = self._subscriptions.setdefault(user_id, {})
+        user_subscriptions[subscription] = None
+
+        while len(user_subscriptions) > self.max_subscriptions_per_user:
+            oldest = next(iter(user_subscriptions))
+            self._drop(oldest)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+            Удаляет подписку (при отключении клиента).
+        """
+        user_subscriptions = self._subscriptions.get(subscription.user_id)
+        if user_subscriptions is not None:
+            user_subscriptions.pop(subscription, None)
+            if not user_subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, event: Dict[str, Any]) -> None:
+        """
+            Отправляет событие всем подпискам пользователя.
+        """
+        self.published += 1
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            if subscription.put(event):
+                self.delivered += 1
+            else:
+                self._drop(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Возвращает счетчики рассылки.
+        """
+        return {
+            'users': len(self._subscriptions),
+            'subscriptions': sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+    def _drop(self, subscription: Subscription) -> None:
+        self.unsubscribe(subscription)
+        subscription.close()
+        self.dropped += 1
+
+
+task_event_broker = TaskEventBroker(
+    max_queue_size=get_settings().task_events_queue_size,
+    max_subscriptions_per_user=get_settings().task_events_max_subscriptions_per_user
+)
+
+
+def notify_task_changes(user_id: int, event_type: str, **payload) -> None:
+    """
+        Сообщает об уже зафиксированном изменении задач пользователя: меняет версию списка задач (сбрасывая кэш
+        страниц и ETag) и рассылает событие подписчикам. Типы событий:
+
+            created - созданы задачи tasks
+            updated - изменены задачи tasks
+            completed - задачам ids установлен статус is_complete
+            deleted - удалены задачи ids
+            reset - изменено много задач, список необходимо загрузить заново
+    """
+    task_list_versions.bump(user_id)
+    task_event_broker.publish(user_id, {'type': event_type, **payload})
+
+
+def format_sse_event(event: Dict[str, Any]) -> bytes:
+    """
+        Кодирует событие в формате Server-Sent Events: тип события в поле event, само событие в JSON в поле data.
+    """
+    return b'event: ' + event['type'].encode() + b'\ndata: ' + orjson.dumps(event) + b'\n\n'
+
+
+async def stream_task_events(subscription: Subscription, keepalive: float,
+                             broker: TaskEventBroker = task_event_broker) -> AsyncIterator[bytes]:
+    """
+        Передает события подписки в формате Server-Sent Events. Если событий нет дольше keepalive секунд,
+        отправляется комментарий, чтобы прокси не закрывали простаивающее соединение. Если подписка закрыта
+        брокером, клиент получает событие reset и соединение завершается (EventSource переподключится сам).
+        При отключении клиента подписка удаляется.
+    """
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+
+            if event is None:
+                yield format_sse_event({'type': 'reset'})
+                return
+            yield format_sse_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,71 @@
+import csv
+import io
+
+from enum import Enum
+from typing import AsyncIterator
+
+import orjson
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.future import select
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Task, async_read_session_maker
+
+
+class ExportFormat(str, Enum):
+    """
+        Формат выгрузки и загрузки задач.
+    """
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: 'application/x-ndjson',
+    ExportFormat.csv: 'text/csv',
+}
+
+EXPORT_COLUMNS = ('id', 'title', 'is_complete')
+
+
+def encode_rows(rows, export_format: ExportFormat) -> bytes:
+    """
+        Кодирует порцию строк выгрузки в указанном формате.
+    """
+    if export_format == ExportFormat.csv:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows((row.id, row.title, bool(row.is_complete)) for row in rows)
+        return buffer.getvalue().encode()
+
+    return b''.join(orjson.dumps({'id': row.id, 'title': row.title, 'is_complete': bool(row.is_complete)}) + b'\n'
+                    for row in rows)
+
+
+async def stream_tasks_export(user_id: int, export_format: ExportFormat,
+                              session_maker: async_sessionmaker = async_read_session_maker) -> AsyncIterator[bytes]:
+    """
+        Выгружает задачи пользователя в формате NDJSON или CSV порциями по export_batch_size строк.
+
+        Строки читаются из курсора БД по мере отправки ответа (stream с yield_per), поэтому в памяти находится не
+        больше одной порции независимо от количества задач. Следующая порция читается только после того, как
+        предыдущая передана клиенту, поэтому медленный клиент замедляет чтение, а не увеличивает расход памяти.
+        Генератор открывает собственную сессию для чтения, которая живет, пока передается ответ.
+
+        :param user_id: Идентификатор пользователя, задачи которого выгружаются
+        :param export_format: Формат выгрузки
+        :param session_maker: Фабрика сессий для чтения
+    """
+    batch_size = get_settings().export_batch_size
+    if export_format == ExportFormat.csv:
+        yield ','.join(EXPORT_COLUMNS).encode() + b'\r\n'
+
+    async with session_maker() as session:
+        rows = await session.stream(
+            select(Task.id, Task.title, Task.is_complete)
+            .filter(Task.user_id == user_id)
+            .order_by(Task.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in rows.partitions():
+            yield encode_rows(partition, export_format)
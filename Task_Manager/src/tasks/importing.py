@@ -0,0 +1,151 @@
+import csv
+import datetime
+import io
+import time
+
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import orjson
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Task
+from .export import ExportFormat
+from .models import ImportReport, ImportRowError
+
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+def parse_is_complete(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def iter_csv_rows(file: io.TextIOBase) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+        Построчно читает CSV с заголовком. Обязательна колонка title, колонка is_complete необязательна, остальные
+        колонки (например, id из выгрузки) игнорируются.
+
+        :return: Итератор (номер строки, данные задачи или None, причина отказа или None)
+    """
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None or 'title' not in reader.fieldnames:
+        yield 1, None, 'CSV header must contain a title column'
+        return
+
+    for row in reader:
+        yield reader.line_num, {'title': row.get('title'), 'is_complete': row.get('is_complete')}, None
+
+
+def iter_ndjson_rows(file: io.TextIOBase) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+        Построчно читает NDJSON: каждая непустая строка - объект с полем title и необязательным полем is_complete.
+
+        :return: Итератор (номер строки, данные задачи или None, причина отказа или None)
+    """
+    for line_num, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield line_num, None, 'Invalid JSON'
+            continue
+
+        if not isinstance(row, dict):
+            yield line_num, None, 'Line must be a JSON object'
+            continue
+        yield line_num, row, None
+
+
+class TaskFileParser:
+    """
+        Разбирает строки файла с задачами порциями. Чтение и разбор выполняются синхронно, поэтому read_batch
+        вызывается в пуле потоков, чтобы разбор большого файла не блокировал цикл событий. Ошибочные строки
+        пропускаются и учитываются в rejected, причины первых max_errors из них сохраняются в errors.
+    """
+    def __init__(self, file: io.TextIOBase, import_format: ExportFormat, user_id: int, max_errors: int):
+        self.rows = iter_csv_rows(file) if import_format == ExportFormat.csv else iter_ndjson_rows(file)
+        self.user_id = user_id
+        self.max_errors = max_errors
+        self.imported_at = datetime.datetime.utcnow()
+        self.rejected = 0
+        self.errors: List[ImportRowError] = []
+        self.finished = False
+
+    def read_batch(self, size: int) -> List[dict]:
+        """
+            Читает из файла не больше size подготовленных к вставке строк. После окончания файла finished
+            становится True.
+        """
+        batch: List[dict] = []
+        try:
+            for line, row, error in self.rows:
+                title = row.get('title') if row is not None else None
+                if error is None and (not isinstance(title, str) or not title.strip()):
+                    error = 'Empty title'
+
+                if error is not None:
+                    self.rejected += 1
+                    if len(self.errors) < self.max_errors:
+                        self.errors.append(ImportRowError(line=line, detail=error))
+                    continue
+
+                is_complete = parse_is_complete(row.get('is_complete'))
+                batch.append({'user_id': self.user_id, 'title': title.strip(), 'is_complete': is_complete,
+                              'completed_at': self.imported_at if is_complete else None})
+                if len(batch) >= size:
+                    return batch
+
+        except UnicodeDecodeError:
+            # Дальше файл разобрать нельзя, уже прочитанные строки сохраняются:
+            self.rejected += 1
+            self.errors.append(ImportRowError(line=None, detail='File must be UTF-8 encoded'))
+
+        self.finished = True
+        return batch
+
+
+async def import_tasks(session: AsyncSession, user_id: int, file: BinaryIO,
+                       import_format: ExportFormat) -> ImportReport:
+    """
+        Загружает задачи пользователя из файла CSV или NDJSON.
+
+        Файл читается и разбирается построчно в пуле потоков, в памяти находится не больше import_batch_size
+        подготовленных строк. Строки вставляются пакетами через executemany, каждый пакет фиксируется отдельной
+        транзакцией, поэтому соединение-писатель не удерживается на время всей загрузки. Ошибочные строки
+        пропускаются, причины первых import_max_errors из них возвращаются в отчете.
+
+        :param session: Сессия для записи
+        :param user_id: Идентификатор пользователя, которому добавляются задачи
+        :param file: Двоичный файл с задачами (например, UploadFile.file)
+        :param import_format: Формат файла
+        :return: Отчет о количестве загруженных и отклоненных строк и времени загрузки
+    """
+    settings = get_settings()
+    started_at = time.perf_counter()
+    imported = 0
+
+    text_file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        parser = TaskFileParser(text_file, import_format=import_format, user_id=user_id,
+                                max_errors=settings.import_max_errors)
+        while not parser.finished:
+            batch = await run_in_threadpool(parser.read_batch, settings.import_batch_size)
+            if batch:
+                await session.execute(insert(Task), batch)
+                await session.commit()
+                imported += len(batch)
+    finally:
+        # Закрывать исходный файл должен тот, кто его открыл:
+        text_file.detach()
+
+    return ImportReport(imported=imported, rejected=parser.rejected, elapsed=time.perf_counter() - started_at,
+                        errors=parser.errors)
@@ -0,0 +1,148 @@
+import datetime
+
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, conlist, constr
+
+from Task_Manager.src.config import get_settings
+
+
+class TaskStatus(str, Enum):
+    """
+        Фильтр списка задач по статусу.
+    """
+    open = 'open'
+    completed = 'completed'
+
+
+class TaskCreate(BaseModel):
+    """
+        Проверяет запрос на создание задачи.
+    """
+    title: constr(strip_whitespace=True, min_length=1)
+
+
+class TaskRead(BaseModel):
+    """
+        Задача в ответах API.
+    """
+    id: int
+    title: str
+    is_complete: bool
+
+    class Config:
+        orm_mode = True
+
+
+class TaskBulkCreate(BaseModel):
+    """
+        Проверяет запрос на массовое создание задач.
+    """
+    titles: conlist(str, min_items=1, max_items=get_settings().tasks_bulk_max_items)
+
+
+class TaskBulkIds(BaseModel):
+    """
+        Проверяет запрос на массовое изменение или удаление задач по их id.
+    """
+    ids: conlist(int, min_items=1, max_items=get_settings().tasks_bulk_max_items)
+
+
+class TaskBulkComplete(TaskBulkIds):
+    """
+        Проверяет запрос на массовую установку статуса задач.
+    """
+    is_complete: bool = True
+
+
+class BulkItemResult(BaseModel):
+    """
+        Результат массовой операции для одного элемента запроса (в том же порядке, что и элементы запроса).
+    """
+    id: Optional[int] = None
+    ok: bool
+    detail: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    """
+        Результаты массовой операции по каждому элементу запроса.
+    """
+    results: List[BulkItemResult]
+
+
+class TaskPage(BaseModel):
+    """
+        Страница списка задач. next_after - курсор для запроса следующей страницы (None, если страница последняя).
+    """
+    tasks: List[TaskRead]
+    next_after: Optional[int] = None
+
+
+class ArchivedTaskRead(BaseModel):
+    """
+        Задача из архива в ответах API. id - номер записи в архиве, по которому задача восстанавливается, task_id -
+        id задачи до переноса в архив.
+    """
+    id: int
+    task_id: int
+    title: str
+    completed_at: Optional[datetime.datetime] = None
+    archived_at: datetime.datetime
+
+    class Config:
+        orm_mode = True
+
+
+class ArchivedTaskPage(BaseModel):
+    """
+        Страница архива задач. next_after - курсор для запроса следующей страницы (None, если страница последняя).
+    """
+    tasks: List[ArchivedTaskRead]
+    next_after: Optional[int] = None
+
+
+class TaskRestoreResult(BulkResult):
+    """
+        Результаты восстановления задач из архива по каждому id записи архива из запроса и восстановленные задачи.
+        Если id задачи за время хранения в архиве занят новой задачей, восстановленная задача получает новый id.
+    """
+    tasks: List[TaskRead]
+
+
+class TaskSearchPage(BaseModel):
+    """
+        Страница результатов поиска задач, упорядоченных по релевантности. next_offset - смещение следующей страницы
+        (None, если страница последняя).
+    """
+    tasks: List[TaskRead]
+    next_offset: Optional[int] = None
+
+
+class TaskCounts(BaseModel):
+    """
+        Количество задач пользователя: всего, незавершенных и завершенных.
+    """
+    total: int
+    open: int
+    completed: int
+
+
+class ImportRowError(BaseModel):
+    """
+        Причина, по которой строка файла не была загружена.
+    """
+    line: Optional[int] = None
+    detail: str
+
+
+class ImportReport(BaseModel):
+    """
+        Отчет о загрузке задач: количество загруженных и отклоненных строк, время загрузки в секундах и причины отказа
+        для первых отклоненных строк.
+    """
+    imported: int
+    rejected: int
+    elapsed: float
+    errors: List[ImportRowError]
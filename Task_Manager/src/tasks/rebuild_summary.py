@@ -0,0 +1,10 @@
+import asyncio
+
+from Task_Manager.src.tasks.summary import rebuild_task_summaries
+
+
+if __name__ == '__main__':
+    # Запуск из директории src с теми же настройками, что и у приложения:
+    # python -m Task_Manager.src.tasks.rebuild_summary
+    users = asyncio.run(rebuild_task_summaries())
+    print(f'Task counters rebuilt for {users} users')
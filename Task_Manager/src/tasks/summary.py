@@ -0,0 +1,44 @@
+import logging
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from Task_Manager.src.database.database import Task, TaskSummary, engine
+from .models import TaskCounts
+
+
+logger = logging.getLogger("")
+
+
+async def get_task_counts(session: AsyncSession, user_id: int) -> TaskCounts:
+    """
+        Возвращает количество задач пользователя из таблицы счетчиков одним чтением по первичному ключу, без
+        подсчета задач.
+    """
+    summary = await session.execute(select(TaskSummary.total, TaskSummary.completed)
+                                    .filter(TaskSummary.user_id == user_id))
+    summary = summary.first()
+    if summary is None:
+        return TaskCounts(total=0, open=0, completed=0)
+    return TaskCounts(total=summary.total, open=summary.total - summary.completed, completed=summary.completed)
+
+
+async def rebuild_task_summaries(bind: AsyncEngine = engine) -> int:
+    """
+        Пересчитывает счетчики задач всех пользователей по таблице task в одной транзакции. Используется, если
+        счетчики разошлись с задачами (например, после изменения таблицы task в обход триггеров).
+
+        :param bind: Движок БД, в которой пересчитываются счетчики
+        :return: Количество пользователей, для которых пересчитаны счетчики
+    """
+    completed = func.coalesce(func.sum(case((Task.is_complete == True, 1), else_=0)), 0)  # noqa: E712
+    async with bind.begin() as conn:
+        await conn.execute(delete(TaskSummary))
+        rebuilt = await conn.execute(
+            insert(TaskSummary).from_select(
+                ['user_id', 'total', 'completed'],
+                select(Task.user_id, func.count(), completed).filter(Task.user_id.is_not(None)).group_by(Task.user_id)
+            )
+        )
+    logger.info(f'Rebuilt task counters for {rebuilt.rowcount} users')
+    return rebuilt.rowcount
@@ -0,0 +1,210 @@
+import datetime
+
+from typing import List, Optional
+
+from sqlalchemy import case, delete, func, insert, not_, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Task
+from .models import BulkItemResult, TaskPage, TaskRead, TaskSearchPage, TaskStatus
+
+
+def get_page_size(limit: Optional[int] = None) -> int:
+    """
+        Возвращает размер страницы списка задач: запрошенный, но не больше максимального из настроек.
+    """
+    settings = get_settings()
+    if limit is None:
+        return settings.tasks_page_size
+    return max(1, min(limit, settings.tasks_max_page_size))
+
+
+async def get_tasks_page(session: AsyncSession, user_id: int, after: Optional[int] = None,
+                         limit: Optional[int] = None, status: Optional[TaskStatus] = None) -> TaskPage:
+    """
+        Возвращает страницу задач пользователя, упорядоченных по id, с помощью курсорной (keyset) пагинации: вместо
+        OFFSET выбираются задачи с id больше курсора, поэтому стоимость запроса любой страницы одинакова. Запрос
+        обслуживается индексом ix_task_user_id или, при фильтре по статусу, ix_task_user_id_is_complete.
+
+        :param session: Сессия для чтения
+        :param user_id: Идентификатор пользователя, задачи которого выбираются
+        :param after: Курсор - id последней задачи предыдущей страницы
+        :param limit: Размер страницы
+        :param status: Фильтр по статусу задачи
+        :return: Страница задач и курсор следующей страницы
+    """
+    page_size = get_page_size(limit)
+
+    query = select(Task).filter(Task.user_id == user_id)
+    if status is not None:
+        query = query.filter(Task.is_complete == (status == TaskStatus.completed))
+    if after is not None:
+        query = query.filter(Task.id > after)
+
+    # Выбираем на одну задачу больше, чтобы узнать, есть ли следующая страница, без отдельного запроса:
+    tasks = await session.execute(query.order_by(Task.id).limit(page_size + 1))
+    tasks = tasks.scalars().all()
+
+    next_after = tasks[page_size - 1].id if len(tasks) > page_size else None
+    return TaskPage(tasks=[TaskRead.from_orm(task) for task in tasks[:page_size]], next_after=next_after)
+
+
+def get_search_expression(user_id: int, query: str) -> Optional[str]:
+    """
+        Составляет выражение FTS5 MATCH из поискового запроса пользователя. Каждое слово запроса экранируется как
+        строка (поэтому синтаксис FTS5 в запросе не работает) и ищется по префиксу, все слова должны встретиться в
+        названии задачи. Условие на владельца задачи также проверяется индексом.
+
+        :return: Выражение для MATCH или None, если в запросе нет слов
+    """
+    terms = ['"' + term.replace('"', '""') + '"*' for term in query.split()]
+    if not terms:
+        return None
+    return f'owner:u{user_id} AND title:({" ".join(terms)})'
+
+
+async def search_tasks(session: AsyncSession, user_id: int, query: str, offset: int = 0,
+                       limit: Optional[int] = None) -> TaskSearchPage:
+    """
+        Ищет задачи пользователя по словам из названия с помощью полнотекстового индекса task_fts и возвращает
+        страницу результатов, упорядоченных по релевантности (bm25).
+
+        :param session: Сессия для чтения
+        :param user_id: Идентификатор пользователя, среди задач которого выполняется поиск
+        :param query: Поисковый запрос
+        :param offset: Количество пропускаемых результатов
+        :param limit: Размер страницы
+        :return: Страница результатов и смещение следующей страницы
+    """
+    page_size = get_page_size(limit)
+    expression = get_search_expression(user_id, query)
+    if expression is None:
+        return TaskSearchPage(tasks=[])
+
+    found = await session.execute(
+        text("SELECT task.id, task.title, task.is_complete FROM task_fts JOIN task ON task.id = task_fts.rowid "
+             "WHERE task_fts MATCH :expression AND task.user_id = :user_id "
+             "ORDER BY task_fts.rank LIMIT :limit OFFSET :offset"),
+        {'expression': expression, 'user_id': user_id, 'limit': page_size + 1, 'offset': offset}
+    )
+    tasks = found.all()
+
+    next_offset = offset + page_size if len(tasks) > page_size else None
+    return TaskSearchPage(tasks=[TaskRead.from_orm(task) for task in tasks[:page_size]], next_offset=next_offset)
+
+
+async def add_task(session: AsyncSession, user_id: int, title: str) -> TaskRead:
+    """
+        Создает задачу пользователя. Изменения не фиксируются, commit выполняет вызывающий.
+    """
+    task = Task(title=title, user_id=user_id, is_complete=False)
+    session.add(task)
+    await session.flush()
+    return TaskRead.from_orm(task)
+
+
+async def toggle_task(session: AsyncSession, user_id: int, task_id: int) -> Optional[TaskRead]:
+    """
+        Меняет статус задачи пользователя на противоположный одним UPDATE ... RETURNING: владелец задачи проверяется в
+        условии запроса, поэтому задача не загружается заранее и не может смениться между проверкой и изменением.
+        Время завершения задачи устанавливается при ее завершении и сбрасывается при открытии. Изменения не
+        фиксируются, commit выполняет вызывающий.
+
+        :return: Задача после изменения или None, если задачи нет или она принадлежит другому пользователю
+    """
+    toggled = await session.execute(
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .values(is_complete=not_(func.coalesce(Task.is_complete, False)),
+                completed_at=case((func.coalesce(Task.is_complete, False), None), else_=datetime.datetime.utcnow()))
+        .returning(Task.id, Task.title, Task.is_complete)
+        .execution_options(synchronize_session=False)
+    )
+    task = toggled.first()
+    return TaskRead.from_orm(task) if task is not None else None
+
+
+async def delete_task(session: AsyncSession, user_id: int, task_id: int) -> bool:
+    """
+        Удаляет задачу пользователя одним DELETE ... RETURNING с проверкой владельца в условии запроса. Изменения не
+        фиксируются, commit выполняет вызывающий.
+
+        :return: True, если задача была удалена, False - если задачи нет или она принадлежит другому пользователю
+    """
+    deleted = await session.execute(
+        delete(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    return deleted.first() is not None
+
+
+async def bulk_add_tasks(session: AsyncSession, user_id: int, titles: List[str]) -> List[BulkItemResult]:
+    """
+        Создает задачи пользователя одним многострочным INSERT. Пустые названия отклоняются, остальные задачи
+        создаются. Изменения не фиксируются, commit выполняет вызывающий.
+
+        :return: Результаты в порядке названий из запроса
+    """
+    titles = [title.strip() for title in titles]
+    valid_titles = [title for title in titles if title]
+    ids = []
+    if valid_titles:
+        created = await session.execute(
+            insert(Task).values([{'title': title, 'user_id': user_id, 'is_complete': False}
+                                 for title in valid_titles]).returning(Task.id)
+        )
+        # Порядок строк RETURNING не гарантирован, но id новых строк возрастают в порядке вставки:
+        ids = sorted(created.scalars().all())
+
+    ids = iter(ids)
+    return [BulkItemResult(id=next(ids), ok=True) if title else BulkItemResult(ok=False, detail='Empty title')
+            for title in titles]
+
+
+async def bulk_set_tasks_complete(session: AsyncSession, user_id: int, task_ids: List[int],
+                                  is_complete: bool) -> List[BulkItemResult]:
+    """
+        Устанавливает статус задачам пользователя одним UPDATE, в условии которого проверяется владелец задач.
+        Изменения не фиксируются, commit выполняет вызывающий.
+
+        :return: Результаты в порядке id из запроса
+    """
+    updated = await session.execute(
+        update(Task)
+        .where(Task.user_id == user_id, Task.id.in_(set(task_ids)))
+        .values(is_complete=is_complete,
+                # Время завершения уже завершенных задач не меняется:
+                completed_at=func.coalesce(Task.completed_at, datetime.datetime.utcnow()) if is_complete else None)
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    return get_bulk_results(task_ids, set(updated.scalars().all()))
+
+
+async def bulk_delete_tasks(session: AsyncSession, user_id: int, task_ids: List[int]) -> List[BulkItemResult]:
+    """
+        Удаляет задачи пользователя одним DELETE, в условии которого проверяется владелец задач. Изменения не
+        фиксируются, commit выполняет вызывающий.
+
+        :return: Результаты в порядке id из запроса
+    """
+    deleted = await session.execute(
+        delete(Task)
+        .where(Task.user_id == user_id, Task.id.in_(set(task_ids)))
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
+    return get_bulk_results(task_ids, set(deleted.scalars().all()))
+
+
+def get_bulk_results(task_ids: List[int], affected_ids: set) -> List[BulkItemResult]:
+    """
+        Сопоставляет id из запроса с id, которые затронула массовая операция. Задачи, которых нет или которые
+        принадлежат другому пользователю, не различаются.
+    """
+    return [BulkItemResult(id=task_id, ok=True) if task_id in affected_ids else
+            BulkItemResult(id=task_id, ok=False, detail='Task not found') for task_id in task_ids]
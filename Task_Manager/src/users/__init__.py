@@ -1,2 +1,7 @@
+from .cache import *
+from .hashing import *
 from .models import *
+from .pages import *
+from .throttling import *
+from .tokens import *
 from .utils import *
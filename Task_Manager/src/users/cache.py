@@ -0,0 +1,119 @@
+import time
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from Task_Manager.src.config import get_settings
+from .models import CachedUser
+
+
+class TokenCache:
+    """
+        Ограниченный по размеру LRU кэш с TTL для соответствия токен -> снимок пользователя. Позволяет не выполнять
+        запрос User JOIN Token к БД на каждый авторизованный запрос.
+
+        Запись живет не дольше ttl секунд и не дольше срока действия самого токена. При переполнении вытесняется
+        запись, к которой дольше всего не обращались.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[CachedUser, float]] = OrderedDict()
+        self._user_tokens: Dict[int, Set[str]] = {}  # Индекс user_id -> токены для инвалидации по пользователю
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        """
+            Возвращает снимок пользователя по токену или None, если записи нет или она устарела.
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        user, deadline = entry
+        if deadline <= time.monotonic():
+            self._remove(token)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user: CachedUser) -> None:
+        """
+            Сохраняет снимок пользователя в кэш. Время жизни записи ограничивается сроком действия токена.
+        """
+        if self.max_size <= 0:
+            return
+
+        token_lifetime = (user.expires - datetime.now()).total_seconds()
+        if token_lifetime <= 0:
+            return
+
+        if token in self._entries:
+            self._remove(token)
+
+        self._entries[token] = (user, time.monotonic() + min(self.ttl, token_lifetime))
+        self._user_tokens.setdefault(user.id, set()).add(token)
+
+        while len(self._entries) > self.max_size:
+            oldest_token = next(iter(self._entries))
+            self._remove(oldest_token)
+            self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        """
+            Удаляет из кэша запись для указанного токена (например, при выходе пользователя из системы).
+        """
+        if token in self._entries:
+            self._remove(token)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+            Удаляет из кэша все токены указанного пользователя (например, при его деактивации).
+        """
+        for token in list(self._user_tokens.get(user_id, ())):
+            self._remove(token)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """
+            Полностью очищает кэш. Счетчики при этом сохраняются.
+        """
+        self._entries.clear()
+        self._user_tokens.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Возвращает счетчики кэша, необходимые для подбора его размера.
+        """
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+    def _remove(self, token: str) -> None:
+        user, _ = self._entries.pop(token)
+        user_tokens = self._user_tokens.get(user.id)
+        if user_tokens is not None:
+            user_tokens.discard(token)
+            if not user_tokens:
+                del self._user_tokens[user.id]
+
+
+token_cache = TokenCache(max_size=get_settings().token_cache_size, ttl=get_settings().token_cache_ttl)
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import hmac
+import random
+import string
+import logging
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import bcrypt
+
+from Task_Manager.src.config import get_settings
+
+
+logger = logging.getLogger("")
+settings = get_settings()
+
+
+def get_random_string(length=12) -> str:
+    """
+        Генерирует случайную строку, использующуюся как соль.
+    """
+    try:
+        return "".join(random.choice(string.ascii_letters) for _ in range(length))
+    except Exception as e:
+        logger.debug(e)
+
+
+def hash_password(password: str, salt: str = None, iterations: int = 100_000) -> str:
+    """
+        Хеширует пароль с солью с помощью PBKDF2-SHA256.
+    """
+    try:
+        if salt is None:
+            salt = get_random_string()
+        enc = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)
+        return enc.hex()
+    except Exception as e:
+        logger.debug(e)
+
+
+def encode_password(password: str) -> str:
+    """
+        Хеширует пароль алгоритмом и стоимостью из настроек и возвращает хеш в самоописывающем формате, в котором
+        хранятся алгоритм и параметры хеширования:
+
+            pbkdf2_sha256$<количество итераций>$<соль>$<хеш>
+            bcrypt$<хеш bcrypt вместе с солью и стоимостью>
+    """
+    try:
+        if settings.password_hash_algorithm == 'bcrypt':
+            hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=settings.bcrypt_rounds))
+            return f"bcrypt${hashed.decode()}"
+
+        salt = get_random_string()
+        iterations = settings.pbkdf2_iterations
+        return f"pbkdf2_sha256${iterations}${salt}${hash_password(password, salt, iterations)}"
+    except Exception as e:
+        logger.debug(e)
+
+
+def validate_password(password: str, hashed_password: str) -> bool:
+    """
+        Проверяет, что хеш пароля совпадает с хешем из БД. Поддерживает как самоописывающий формат, так и старый формат
+        соль$хеш (PBKDF2-SHA256 со 100 000 итераций).
+    """
+    try:
+        algorithm, _, encoded = hashed_password.partition("$")
+        if algorithm == 'bcrypt':
+            return bcrypt.checkpw(password.encode(), encoded.encode())
+
+        if algorithm == 'pbkdf2_sha256':
+            iterations, salt, hashed = encoded.split("$")
+            return hmac.compare_digest(hash_password(password, salt, int(iterations)), hashed)
+
+        salt, hashed = hashed_password.split("$")
+        return hmac.compare_digest(hash_password(password, salt), hashed)
+    except Exception as e:
+        logger.debug(e)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+        Проверяет, что хеш пароля получен не тем алгоритмом или не с той стоимостью, которые заданы в настройках, и его
+        необходимо пересчитать при следующем успешном входе пользователя.
+    """
+    algorithm, _, encoded = hashed_password.partition("$")
+    if algorithm != settings.password_hash_algorithm:
+        return True
+
+    if algorithm == 'bcrypt':
+        return int(encoded.split("$")[2]) != settings.bcrypt_rounds
+
+    return int(encoded.split("$")[0]) != settings.pbkdf2_iterations
+
+
+class PasswordHasherBusy(Exception):
+    """
+        Исключение, выбрасываемое, когда очередь на хеширование паролей переполнена.
+    """
+
+
+class PasswordHasher:
+    """
+        Асинхронная обертка над функциями хеширования паролей. Хеширование выполняется в отдельном пуле потоков или
+        процессов, чтобы не блокировать цикл событий на время вычисления PBKDF2.
+
+        Количество одновременно выполняемых вычислений ограничено max_concurrency, остальные запросы ждут своей
+        очереди. Если в очереди уже max_waiting запросов, новый запрос сразу отклоняется исключением
+        PasswordHasherBusy. Счетчики in_flight, waiting и peak_waiting позволяют следить за глубиной этой очереди.
+    """
+    def __init__(self, executor_type: str, max_workers: int, max_concurrency: int, max_waiting: int):
+        if executor_type not in ('thread', 'process'):
+            raise ValueError(f'Unknown password hash executor type: {executor_type}')
+
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def hash_password(self, password: str, salt: str = None) -> str:
+        """
+            Асинхронно хеширует пароль с солью.
+        """
+        return await self._run(hash_password, password, salt)
+
+    async def encode_password(self, password: str) -> str:
+        """
+            Асинхронно хеширует пароль в самоописывающем формате согласно настройкам.
+        """
+        return await self._run(encode_password, password)
+
+    async def validate_password(self, password: str, hashed_password: str) -> bool:
+        """
+            Асинхронно проверяет, что хеш пароля совпадает с хешем из БД.
+        """
+        return await self._run(validate_password, password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Возвращает счетчики загрузки пула хеширования.
+        """
+        return {
+            'max_workers': self.max_workers,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'peak_waiting': self.peak_waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+    def is_busy(self) -> bool:
+        """
+            Проверяет, что все слоты хеширования заняты и очередь ожидания заполнена, то есть новый запрос будет
+            отклонен.
+        """
+        return self.in_flight >= self.max_concurrency and self.waiting >= self.max_waiting
+
+    def shutdown(self) -> None:
+        """
+            Останавливает пул потоков или процессов. При следующем обращении пул будет создан заново.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        # Пул и семафор создаются лениво, чтобы не порождать процессы при импорте и привязаться к текущему циклу:
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='password_hasher')
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise PasswordHasherBusy('Too many pending password hash computations')
+
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+
+password_hasher = PasswordHasher(
+    executor_type=settings.password_hash_executor,
+    max_workers=settings.password_hash_workers,
+    max_concurrency=settings.password_hash_max_concurrency,
+    max_waiting=settings.password_hash_max_waiting
+)
@@ -30,3 +30,13 @@ class TokenBase(BaseModel):
             Конвертирует UUID в hex строку .
         """
         return value.hex
+
+
+class CachedUser(BaseModel):
+    """
+        Облегченный снимок пользователя, которого достаточно для авторизации запроса. Хранится в кэше токенов вместо
+        полноценной модели User из БД.
+    """
+    id: int
+    is_active: bool
+    expires: datetime
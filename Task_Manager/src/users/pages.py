@@ -0,0 +1,102 @@
+import hashlib
+import os
+import time
+
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.status import HTTP_304_NOT_MODIFIED
+from starlette.templating import Jinja2Templates
+from starlette.types import ASGIApp
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.tasks.cache import etag_matches
+
+
+class RenderedPage(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class StaticPages:
+    """
+        Страницы без данных пользователя (стартовая, авторизация, регистрация и их варианты с сообщениями об ошибках),
+        отрисованные один раз и хранящиеся в памяти в виде байтов. Каждый вариант страницы определяется шаблоном и
+        значениями флагов из контекста.
+
+        Ссылки в страницах строятся как пути без схемы и хоста (url_path_for приложения), поэтому одна и та же
+        отрисовка подходит для любого запроса. Не чаще чем раз в check_interval секунд проверяется время изменения
+        файлов шаблонов, и при изменении любого из них (в том числе base.html) все страницы отрисовываются заново.
+    """
+    def __init__(self, templates: Jinja2Templates, check_interval: float, max_age: int):
+        self.templates = templates
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._pages: Dict[Tuple, RenderedPage] = {}
+        self._templates_mtime: Optional[float] = None
+        self._checked_at = float('-inf')
+
+        self.renders = 0
+
+    def get(self, app: ASGIApp, name: str, **context) -> RenderedPage:
+        """
+            Возвращает отрисованную страницу, при отсутствии или после изменения шаблонов отрисовывает ее.
+
+            :param app: Приложение, по маршрутам которого строятся ссылки
+            :param name: Имя шаблона
+            :param context: Значения флагов шаблона
+        """
+        self._check_templates()
+        key = (name, *sorted(context.items()))
+        page = self._pages.get(key)
+        if page is None:
+            page = self._pages[key] = self._render(app, name, context)
+        return page
+
+    def response(self, request: Request, name: str, status_code: int = 200, cacheable: bool = True,
+                 **context) -> Response:
+        """
+            Возвращает ответ с отрисованной страницей. Страницы, которые отдаются на GET запросы, можно хранить в
+            браузере и прокси max_age секунд и затем проверять по ETag (304 Not Modified, если страница не менялась).
+            Варианты страниц, которые отдаются на отправку формы, не кэшируются.
+
+            :param request: Запрос, из которого берутся приложение и заголовок If-None-Match
+            :param name: Имя шаблона
+            :param status_code: Код ответа
+            :param cacheable: Добавлять ли заголовки ETag и Cache-Control
+            :param context: Значения флагов шаблона
+        """
+        page = self.get(request.app, name, **context)
+        if not cacheable:
+            return Response(content=page.body, status_code=status_code, media_type='text/html',
+                            headers={'Cache-Control': 'no-store'})
+
+        headers = {'ETag': page.etag, 'Cache-Control': f'public, max-age={self.max_age}'}
+        if etag_matches(request.headers.get('if-none-match'), page.etag):
+            return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=page.body, status_code=status_code, media_type='text/html', headers=headers)
+
+    def _render(self, app: ASGIApp, name: str, context: dict) -> RenderedPage:
+        # url_for из контекста заменяет функцию шаблонизатора, которой нужен запрос для построения полного URL:
+        body = self.templates.get_template(name).render({
+            'url_for': lambda route_name, **path_params: app.url_path_for(route_name, **path_params),
+            'app_name': get_settings().app_name,
+            **context,
+        }).encode()
+        self.renders += 1
+        return RenderedPage(body=body, etag=f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+
+    def _check_templates(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        templates_mtime = max((os.stat(os.path.join(directory, file_name)).st_mtime
+                               for search_path in self.templates.env.loader.searchpath
+                               for directory, _, file_names in os.walk(search_path)
+                               for file_name in file_names), default=0.0)
+        if templates_mtime != self._templates_mtime:
+            self._pages.clear()
+            self._templates_mtime = templates_mtime
@@ -0,0 +1,76 @@
+import time
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+
+from Task_Manager.src.config import get_settings
+
+
+settings = get_settings()
+
+
+class SlidingWindowLimiter:
+    """
+        Ограничитель количества попыток за скользящее окно времени, работающий в памяти процесса.
+
+        Для каждого ключа (email, IP-адрес клиента) хранится не более limit моментов последних попыток, а количество
+        ключей ограничено max_keys: при переполнении забывается ключ, к которому дольше всего не обращались. Таким
+        образом, объем памяти ограничен при любом потоке запросов.
+    """
+    def __init__(self, limit: int, window: float, max_keys: int):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._attempts: OrderedDict[str, Deque[float]] = OrderedDict()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str) -> float:
+        """
+            Регистрирует попытку для ключа.
+
+            :return: 0, если попытка разрешена, иначе количество секунд, через которое можно повторить попытку
+        """
+        now = time.monotonic()
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = self._attempts[key] = deque(maxlen=self.limit)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+        else:
+            self._attempts.move_to_end(key)
+
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+
+        if len(attempts) >= self.limit:
+            self.rejected += 1
+            return attempts[0] + self.window - now
+
+        attempts.append(now)
+        self.allowed += 1
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Возвращает счетчики ограничителя.
+        """
+        return {
+            'keys': len(self._attempts),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+        }
+
+
+email_login_limiter = SlidingWindowLimiter(
+    limit=settings.login_attempts_per_email,
+    window=settings.login_rate_limit_window,
+    max_keys=settings.login_rate_limit_max_keys
+)
+
+ip_login_limiter = SlidingWindowLimiter(
+    limit=settings.login_attempts_per_ip,
+    window=settings.login_rate_limit_window,
+    max_keys=settings.login_rate_limit_max_keys
+)
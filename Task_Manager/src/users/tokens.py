@@ -0,0 +1,123 @@
+import time
+import logging
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import uuid4
+
+import jwt
+
+from Task_Manager.src.config import get_settings
+from .models import CachedUser
+
+
+logger = logging.getLogger("")
+settings = get_settings()
+
+
+class RevocationList:
+    """
+        Небольшой ограниченный по размеру список отозванных подписанных токенов. Хранит идентификаторы (jti) отозванных
+        токенов, а также момент, до которого считаются отозванными все токены пользователя (например, при деактивации).
+
+        Запись хранится только до истечения срока действия токена, после чего подпись и так перестает быть валидной.
+        При переполнении вытесняются самые старые записи, поэтому размер списка должен быть больше ожидаемого
+        количества отзывов за время жизни токена.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Ключ -> (момент отзыва, момент, после которого запись можно забыть):
+        self._tokens: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._users: OrderedDict[int, Tuple[float, float]] = OrderedDict()
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        """
+            Отзывает токен с указанным jti до момента истечения его срока действия.
+        """
+        self._add(self._tokens, jti, expires_at)
+
+    def revoke_user(self, user_id: int) -> None:
+        """
+            Отзывает все токены пользователя, выпущенные до текущего момента.
+        """
+        self._add(self._users, user_id, time.time() + settings.access_token_expire_minutes * 60)
+
+    def is_revoked(self, jti: str, user_id: int, issued_at: float) -> bool:
+        """
+            Проверяет, отозван ли токен по его jti или по пользователю.
+        """
+        if jti in self._tokens:
+            return True
+        revoked_user = self._users.get(user_id)
+        return revoked_user is not None and issued_at <= revoked_user[0]
+
+    def _add(self, entries: OrderedDict, key, forget_at: float) -> None:
+        if self.max_size <= 0:
+            return
+
+        now = time.time()
+        entries[key] = (now, forget_at)
+        entries.move_to_end(key)
+
+        # Забываем записи, которые уже не нужны, и вытесняем самые старые при переполнении:
+        while entries:
+            oldest_key, (_, oldest_forget_at) = next(iter(entries.items()))
+            if oldest_forget_at > now and len(entries) <= self.max_size:
+                break
+            del entries[oldest_key]
+
+
+revocation_list = RevocationList(max_size=settings.token_revocation_list_size)
+
+
+def create_access_token(user_id: int, is_active: bool) -> str:
+    """
+        Создает подписанный токен доступа, содержащий id пользователя, признак активности и срок действия. Такой токен
+        проверяется без обращения к БД.
+    """
+    issued_at = datetime.now()
+    expires = issued_at + timedelta(minutes=settings.access_token_expire_minutes)
+    payload = {
+        'sub': str(user_id),
+        'act': is_active,
+        'iat': int(issued_at.timestamp()),
+        # Время выпуска с долями секунды сравнивается с моментом отзыва всех токенов пользователя, чтобы токен,
+        # выпущенный в ту же секунду после отзыва, не считался отозванным. В iat доли секунды хранить нельзя: PyJWT
+        # сравнивает iat с текущим временем, округленным до секунд, и до конца секунды считает такой токен еще не
+        # действующим:
+        'iat_precise': issued_at.timestamp(),
+        'exp': int(expires.timestamp()),
+        'jti': uuid4().hex,
+    }
+    return jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+
+
+def decode_access_token(token: str) -> Optional[CachedUser]:
+    """
+        Проверяет подпись и срок действия токена доступа и возвращает снимок пользователя из его содержимого или None,
+        если токен невалиден или отозван.
+    """
+    try:
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        user_id = int(payload['sub'])
+        issued_at = payload.get('iat_precise', payload['iat'])  # В старых токенах есть только iat
+        if revocation_list.is_revoked(payload['jti'], user_id, issued_at):
+            return None
+
+        return CachedUser(id=user_id, is_active=payload['act'], expires=datetime.fromtimestamp(payload['exp']))
+
+    except (jwt.InvalidTokenError, KeyError, ValueError) as e:
+        logger.debug(e)
+
+
+def revoke_access_token(token: str) -> None:
+    """
+        Добавляет токен доступа в список отозванных. Невалидные и истекшие токены игнорируются.
+    """
+    try:
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        revocation_list.revoke_token(payload['jti'], payload['exp'])
+
+    except (jwt.InvalidTokenError, KeyError) as e:
+        logger.debug(e)
@@ -1,6 +1,4 @@
-import hashlib
-import random
-import string
+import asyncio
 import logging
 import os
 
@@ -10,12 +8,19 @@ from fastapi import HTTPException, Depends, status
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
 from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.future import select
-from starlette.requests import Request
+from starlette.requests import HTTPConnection, Request
 from starlette.status import HTTP_401_UNAUTHORIZED
 
-from Task_Manager.src.database.database import Token, User, get_async_session
-from .models import RegisterUser, TokenBase
+from Task_Manager.src.database.database import Token, User, async_read_session_maker, async_session_maker, \
+    get_read_session
+from .cache import token_cache
+from .hashing import get_random_string, hash_password, validate_password, password_needs_rehash, password_hasher, \
+    PasswordHasherBusy
+from .models import RegisterUser, TokenBase, CachedUser
+from .tokens import settings, create_access_token, decode_access_token, revoke_access_token, revocation_list
 
 
 def create_logging_folder() -> None:
@@ -34,97 +39,203 @@ logger = logging.getLogger("")
 logger.setLevel(level=logging.DEBUG)
 
 
-def get_random_string(length=12) -> str:
+async def get_user_by_email(session: AsyncSession, email: str) -> User:
     """
-        Генерирует случайную строку, использующуюся как соль.
+        Возвращает информацию о пользователе.
     """
     try:
-        return "".join(random.choice(string.ascii_letters) for _ in range(length))
+        user = await session.execute(select(User).filter(User.email == email))
+        user = user.scalar()
+        return user
+
     except Exception as e:
         logger.debug(e)
 
 
-def hash_password(password: str, salt: str = None) -> str:
+async def get_user_by_token(session: AsyncSession, token: str) -> User:
     """
-        Хеширует пароль с солью.
+        Возвращает информацию о владельце указанного токена
     """
     try:
-        if salt is None:
-            salt = get_random_string()
-        enc = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 100_000)
-        return enc.hex()
+        user = await session.execute(select(User).join(Token, User.id == Token.user_id).where(
+            (Token.token == token) & (Token.expires > datetime.now())))
+        user = user.scalar()
+        return user
+
     except Exception as e:
         logger.debug(e)
 
 
-def validate_password(password: str, hashed_password: str) -> bool:
+async def get_user_snapshot_by_token(session: AsyncSession, token: str) -> Optional[CachedUser]:
     """
-        Проверяет, что хеш пароля совпадает с хешем из БД.
+        Возвращает снимок (id, активность, срок действия токена) владельца указанного токена. Снимок сначала ищется в
+        кэше токенов, и только при промахе выполняется запрос к БД.
     """
     try:
-        salt, hashed = hashed_password.split("$")
-        return hash_password(password, salt) == hashed
+        cached_user = token_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
+        row = await session.execute(
+            select(User.id, User.is_active, Token.expires).join(Token, User.id == Token.user_id).where(
+                (Token.token == token) & (Token.expires > datetime.now())))
+        row = row.first()
+        if row is None:
+            return None
+
+        user = CachedUser(id=row.id, is_active=row.is_active, expires=row.expires)
+        token_cache.set(token, user)
+        return user
+
     except Exception as e:
         logger.debug(e)
 
 
-async def get_user_by_email(email: str) -> User:
+async def create_user_token(session: AsyncSession, user_id: int) -> TokenBase:
     """
-        Возвращает информацию о пользователе.
+        Создает токен для пользователя с указанным user_id.
     """
     try:
-        session = await get_async_session()
-        user = await session.execute(select(User).filter(User.email == email))
-        user = user.scalar()
-        return user
+        new_token = Token(user_id=user_id,
+                          expires=datetime.now() + timedelta(minutes=settings.access_token_expire_minutes))
+        session.add(new_token)
+        await session.flush()
+
+        # Оставляем пользователю не более max_tokens_per_user самых новых токенов:
+        newest_tokens = select(Token.id).where(Token.user_id == user_id).order_by(Token.id.desc()).limit(
+            settings.max_tokens_per_user)
+        outdated_tokens = await session.execute(
+            delete(Token).where((Token.user_id == user_id) & Token.id.not_in(newest_tokens)).returning(Token.token))
+        outdated_tokens = outdated_tokens.scalars().all()
+
+        await session.commit()
+        for outdated_token in outdated_tokens:
+            token_cache.invalidate(outdated_token)
+
+        # Значения токена уже получены при flush. Повторное чтение (refresh) снова заняло бы соединение-писатель до
+        # закрытия сессии запроса:
+        return TokenBase(token=new_token.token, expires=new_token.expires)
 
     except Exception as e:
         logger.debug(e)
 
 
-async def get_user_by_token(token: str) -> User:
+async def issue_access_token(session: AsyncSession, user: User) -> str:
     """
-        Возвращает информацию о владельце указанного токена
+        Выдает пользователю токен доступа для cookies в зависимости от настройки token_mode: подписанный токен,
+        проверяемый без обращения к БД, или токен, сохраненный в таблице token.
+    """
+    if settings.token_mode == 'jwt':
+        return create_access_token(user_id=user.id, is_active=user.is_active)
+
+    token = await create_user_token(session=session, user_id=user.id)
+    return token.token
+
+
+async def revoke_user_token(session: AsyncSession, token: str) -> None:
+    """
+        Отзывает токен доступа при выходе пользователя из системы.
     """
     try:
-        session = await get_async_session()
-        user = await session.execute(select(User).join(Token, User.id == Token.user_id).where(
-            (Token.token == token) & (Token.expires > datetime.now())))
-        user = user.scalar()
-        return user
+        if settings.token_mode == 'jwt':
+            revoke_access_token(token)
+            return
+
+        token_cache.invalidate(token)
+        await session.execute(delete(Token).where(Token.token == token))
+        await session.commit()
 
     except Exception as e:
         logger.debug(e)
 
 
-async def create_user_token(user_id: int) -> TokenBase:
+async def delete_expired_tokens(batch_size: int, session_maker: async_sessionmaker = async_session_maker) -> int:
     """
-        Создает токен для пользователя с указанным user_id.
+        Удаляет из БД просроченные токены пачками не больше batch_size строк, каждая пачка - в отдельной транзакции,
+        чтобы не блокировать БД надолго.
+
+        :param batch_size: Количество токенов, удаляемых за одну транзакцию
+        :param session_maker: Фабрика сессий для записи
+        :return: Количество удаленных токенов
+    """
+    deleted = 0
+    while True:
+        async with session_maker() as session:
+            expired_tokens = select(Token.id).where(Token.expires <= datetime.now()).limit(batch_size)
+            result = await session.execute(delete(Token).where(Token.id.in_(expired_tokens)))
+            await session.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+        await asyncio.sleep(0)  # Даем обработать накопившиеся запросы между пачками
+
+
+async def run_token_sweeper(session_maker: async_sessionmaker = async_session_maker) -> None:
+    """
+        Фоновая задача, периодически удаляющая просроченные токены из БД.
+
+        :param session_maker: Фабрика сессий для записи
+    """
+    while True:
+        try:
+            deleted = await delete_expired_tokens(batch_size=settings.token_sweep_batch_size,
+                                                  session_maker=session_maker)
+            if deleted:
+                logger.info(f'Token sweeper deleted {deleted} expired tokens')
+
+        except Exception as e:
+            logger.debug(e)
+
+        await asyncio.sleep(settings.token_sweep_interval)
+
+
+async def create_user(session: AsyncSession, user: RegisterUser) -> None:
+    """
+        Создает нового пользователя в БД.
     """
     try:
-        new_token = Token(user_id=user_id, expires=datetime.now() + timedelta(weeks=2))
-        session = await get_async_session()
-        session.add(new_token)
+        hashed_password = await password_hasher.encode_password(user.password)
+
+        new_user = User(email=user.email, username=user.username, hashed_password=hashed_password)
+        session.add(new_user)
         await session.commit()
-        await session.refresh(new_token)
-        return TokenBase(token=new_token.token, expires=new_token.expires)
+
+    except PasswordHasherBusy:
+        raise
 
     except Exception as e:
         logger.debug(e)
 
 
-async def create_user(user: RegisterUser) -> None:
+async def rehash_user_password(user_id: int, password: str,
+                               session_maker: async_sessionmaker = async_session_maker) -> None:
     """
-        Создает нового пользователя в БД.
+        Пересчитывает хеш пароля пользователя с алгоритмом и стоимостью из текущих настроек. Вызывается после
+        успешного входа, когда известен пароль в открытом виде, поэтому смена настроек не требует миграции.
     """
     try:
-        salt = get_random_string()
-        hashed_password = hash_password(user.password, salt)
+        hashed_password = await password_hasher.encode_password(password)
+        async with session_maker() as session:
+            await session.execute(update(User).where(User.id == user_id).values(hashed_password=hashed_password))
+            await session.commit()
 
-        new_user = User(email=user.email, username=user.username, hashed_password=f"{salt}${hashed_password}")
-        session = await get_async_session()
-        session.add(new_user)
+    except Exception as e:
+        logger.debug(e)
+
+
+async def deactivate_user(session: AsyncSession, user_id: int) -> None:
+    """
+        Деактивирует пользователя, удаляет все его токены из БД и кэша и отзывает выданные ему подписанные токены,
+        чтобы деактивация вступила в силу сразу же.
+    """
+    try:
+        await session.execute(update(User).where(User.id == user_id).values(is_active=False))
+        await session.execute(delete(Token).where(Token.user_id == user_id))
         await session.commit()
+        token_cache.invalidate_user(user_id)
+        revocation_list.revoke_user(user_id)
 
     except Exception as e:
         logger.debug(e)
@@ -133,7 +244,8 @@ async def create_user(user: RegisterUser) -> None:
 class OAuth2PasswordBearerWithCookie(OAuth2):
     """
         Класс отнаследован от OAuth2 и аналогичен классу OAuth2PasswordBearer библиотеки fastapi.security. Однако,
-        для получения токена в нем используется не заголовок (HEADER) с названием Authorization, а cookies.
+        для получения токена в нем используются cookies, а заголовок (HEADER) с названием Authorization проверяется,
+        только если cookie нет (так токен передают клиенты JSON API).
     """
     def __init__(
         self,
@@ -154,10 +266,8 @@ class OAuth2PasswordBearerWithCookie(OAuth2):
         )
 
     async def __call__(self, request: Request) -> Optional[str]:
-        # authorization: str = request.headers.get("Authorization")
-        authorization: str = request.cookies.get("access_token")
-        scheme, param = get_authorization_scheme_param(authorization)
-        if not authorization or scheme.lower() != "bearer":
+        param = get_connection_token(request)
+        if param is None:
             if self.auto_error:
                 raise HTTPException(
                     status_code=HTTP_401_UNAUTHORIZED,
@@ -169,20 +279,48 @@ class OAuth2PasswordBearerWithCookie(OAuth2):
         return param
 
 
+def get_connection_token(connection: HTTPConnection) -> Optional[str]:
+    """
+        Возвращает токен доступа из cookie access_token или, если cookie нет, из заголовка Authorization. Принимает
+        и HTTP запрос, и WebSocket соединение.
+
+        :return: Токен или None, если токена нет или он передан не по схеме Bearer
+    """
+    authorization: str = connection.cookies.get("access_token") or connection.headers.get("Authorization")
+    scheme, param = get_authorization_scheme_param(authorization)
+    if not authorization or scheme.lower() != "bearer":
+        return None
+    return param
+
+
 oauth2_scheme = OAuth2PasswordBearerWithCookie(tokenUrl="auth")
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def authenticate_token(session: AsyncSession, token: str) -> Optional[CachedUser]:
+    """
+        Определяет пользователя по токену доступа: из подписанного токена или из кэша токенов и БД, в зависимости от
+        режима токенов.
+
+        :return: Снимок пользователя или None, если токен невалиден
+    """
+    if settings.token_mode == 'jwt':
+        return decode_access_token(token)
+    return await get_user_snapshot_by_token(session=session, token=token)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           session: AsyncSession = Depends(get_read_session)) -> CachedUser:
     """
         Функция получает токен, определяет, какому пользователю в Бд принадлежит данный токен и, если есть такой
         пользователь и он является активным, возвращает данного пользователя.
 
         :param token: Токен, полученный из cookies, для определения текущего пользователя
+        :param session: Сессия текущего запроса только для чтения. Та же сессия передается и в читающие маршруты.
 
-        :return: Объект пользователя (модель User) из БД
+        :return: Снимок пользователя (модель CachedUser) из подписанного токена, кэша токенов или из БД
     """
     try:
-        user = await get_user_by_token(token)
+        user = await authenticate_token(session=session, token=token)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -195,5 +333,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             )
         return user
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.debug(e)
+
+
+async def get_streaming_user(token: str = Depends(oauth2_scheme)) -> CachedUser:
+    """
+        Функция определяет текущего пользователя так же, как get_current_user, но в короткой сессии только для чтения,
+        которая закрывается сразу после проверки токена. Используется потоковыми маршрутами: сессия зависимости
+        get_read_session закрывается только после окончания ответа, и поток удерживал бы соединение-читатель из пула
+        все время, пока клиент подключен.
+
+        :param token: Токен, полученный из cookies, для определения текущего пользователя
+
+        :return: Снимок пользователя (модель CachedUser) из подписанного токена, кэша токенов или из БД
+    """
+    async with async_read_session_maker() as session:
+        return await get_current_user(token=token, session=session)
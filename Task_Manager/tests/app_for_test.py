@@ -0,0 +1,85 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple, Tuple
+
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from starlette.staticfiles import StaticFiles
+
+from Task_Manager.src.config import Settings
+from Task_Manager.src.database.database import User, get_async_session, get_engine_options, get_read_session
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.routers import api_routes
+from Task_Manager.src.routers.api_routes import api_router
+from Task_Manager.src.routers.db_routes import db_router
+from Task_Manager.src.routers.user_routes import user_router
+from Task_Manager.src.users import utils as user_utils
+from Task_Manager.src.users import create_user_token, token_cache
+
+
+class AppForTest(NamedTuple):
+    app: FastAPI
+    session_maker: async_sessionmaker
+    engine: AsyncEngine
+    read_engine: AsyncEngine
+
+
+@asynccontextmanager
+async def create_app_for_test(db_path, monkeypatch) -> AsyncIterator[AppForTest]:
+    """
+        Создает приложение с настоящими маршрутами на отдельном файле SQLite со схемой из миграций и с пулами
+        писателя и читателей, как у приложения.
+
+        :param db_path: Путь до файла БД
+        :param monkeypatch: Фикстура pytest, через которую подменяются фабрики коротких сессий для чтения
+    """
+    settings = Settings(db_url=f"sqlite+aiosqlite:///{db_path}", db_pool_timeout=1)
+    engine = create_async_engine(settings.db_url, **get_engine_options(settings))
+    read_engine = create_async_engine(settings.db_url, **get_engine_options(settings, read_only=True))
+    try:
+        await run_migrations(bind=engine)
+        session_maker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        read_session_maker = async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False)
+
+        async def get_session():
+            async with session_maker() as session:
+                yield session
+
+        async def get_test_read_session():
+            async with read_session_maker() as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(api_router)
+        app.include_router(db_router)
+        app.include_router(user_router)
+        app.mount(path='/static', app=StaticFiles(directory='static'), name='static')  # Для ссылок из шаблонов
+        app.dependency_overrides[get_async_session] = get_session
+        app.dependency_overrides[get_read_session] = get_test_read_session
+
+        # Короткие сессии, которые зависимости и маршруты открывают сами:
+        monkeypatch.setattr(user_utils, 'async_read_session_maker', read_session_maker)
+        monkeypatch.setattr(api_routes, 'async_read_session_maker', read_session_maker)
+
+        yield AppForTest(app=app, session_maker=session_maker, engine=engine, read_engine=read_engine)
+    finally:
+        await engine.dispose()
+        await read_engine.dispose()
+
+
+async def create_user_with_token(session_maker: async_sessionmaker, email: str) -> Tuple[int, str]:
+    """
+        Создает пользователя и токен доступа для него. Токен не остается в кэше токенов, поэтому при первом запросе
+        пользователь определяется по БД.
+
+        :return: id пользователя и токен
+    """
+    async with session_maker() as session:
+        user = await session.execute(insert(User).values(username=email, email=email, hashed_password='hash')
+                                     .returning(User.id))
+        user_id = user.scalar()
+        token = await create_user_token(session=session, user_id=user_id)
+        await session.commit()
+
+    token_cache.invalidate(token.token)
+    return user_id, token.token
@@ -0,0 +1,44 @@
+from httpx import AsyncClient
+
+from Task_Manager.src.users import tokens, utils as user_utils
+from Task_Manager.src.users.cache import token_cache
+from Task_Manager.src.users.tokens import RevocationList, create_access_token, settings
+from .app_for_test import create_app_for_test, create_user_with_token
+
+
+async def test_deactivation_rejects_cached_database_token(tmp_path, monkeypatch):
+    async with create_app_for_test(tmp_path / 'deactivation.db', monkeypatch) as test_app:
+        _, token = await create_user_with_token(test_app.session_maker, email='user@mail.ru')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        async with AsyncClient(app=test_app.app, base_url="http://test") as client:
+            assert (await client.get('/api/v1/tasks', headers=headers)).status_code == 200
+            assert token_cache.get(token) is not None
+
+            response = await client.post('/deactivate', headers=headers)
+            assert response.status_code == 303
+
+            # Токен из кэша перестает действовать сразу же:
+            assert token_cache.get(token) is None
+            assert (await client.get('/api/v1/tasks', headers=headers)).status_code == 401
+
+
+async def test_deactivation_rejects_signed_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'token_mode', 'jwt')
+    revocation_list = RevocationList(max_size=10)
+    monkeypatch.setattr(tokens, 'revocation_list', revocation_list)
+    monkeypatch.setattr(user_utils, 'revocation_list', revocation_list)
+
+    async with create_app_for_test(tmp_path / 'deactivation.db', monkeypatch) as test_app:
+        user_id, _ = await create_user_with_token(test_app.session_maker, email='user@mail.ru')
+        headers = {'Authorization': f'Bearer {create_access_token(user_id=user_id, is_active=True)}'}
+
+        async with AsyncClient(app=test_app.app, base_url="http://test") as client:
+            assert (await client.get('/api/v1/tasks', headers=headers)).status_code == 200
+            assert (await client.post('/deactivate', headers=headers)).status_code == 303
+            assert (await client.get('/api/v1/tasks', headers=headers)).status_code == 401
+
+
+if __name__ == '__main__':
+    test_deactivation_rejects_cached_database_token()
+    test_deactivation_rejects_signed_token()
@@ -0,0 +1,89 @@
+import asyncio
+
+from Task_Manager.src.users.hashing import PasswordHasher, PasswordHasherBusy, hash_password, validate_password, encode_password, \
+    password_needs_rehash, settings
+
+
+async def test_password_hasher_matches_sync_functions():
+    hasher = PasswordHasher(executor_type='thread', max_workers=2, max_concurrency=2, max_waiting=2)
+    try:
+        hashed = await hasher.hash_password('test_password', 'test_salt')
+        assert hashed == hash_password('test_password', 'test_salt')
+
+        assert await hasher.validate_password('test_password', f'test_salt${hashed}') is True
+        assert await hasher.validate_password('invalid_password', f'test_salt${hashed}') is False
+        assert validate_password('test_password', f'test_salt${hashed}') is True
+    finally:
+        hasher.shutdown()
+
+
+async def test_password_hasher_limits_concurrency():
+    hasher = PasswordHasher(executor_type='thread', max_workers=4, max_concurrency=1, max_waiting=2)
+    try:
+        await asyncio.gather(*(hasher.hash_password('test_password', 'test_salt') for _ in range(3)))
+
+        stats = hasher.stats()
+        assert stats['completed'] == 3
+        assert stats['in_flight'] == 0
+        assert stats['waiting'] == 0
+        assert stats['peak_waiting'] == 2
+    finally:
+        hasher.shutdown()
+
+
+async def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(executor_type='thread', max_workers=1, max_concurrency=1, max_waiting=1)
+    try:
+        results = await asyncio.gather(*(hasher.hash_password('test_password', 'test_salt') for _ in range(3)),
+                                       return_exceptions=True)
+
+        assert isinstance(results[2], PasswordHasherBusy)
+        assert hasher.stats()['completed'] == 2
+        assert hasher.stats()['rejected'] == 1
+    finally:
+        hasher.shutdown()
+
+
+def test_encode_password_pbkdf2(monkeypatch):
+    monkeypatch.setattr(settings, 'password_hash_algorithm', 'pbkdf2_sha256')
+    monkeypatch.setattr(settings, 'pbkdf2_iterations', 1_000)
+
+    hashed = encode_password('test_password')
+    assert hashed.startswith('pbkdf2_sha256$1000$')
+    assert validate_password('test_password', hashed) is True
+    assert validate_password('invalid_password', hashed) is False
+    assert password_needs_rehash(hashed) is False
+
+    monkeypatch.setattr(settings, 'pbkdf2_iterations', 2_000)
+    assert password_needs_rehash(hashed) is True
+
+
+def test_encode_password_bcrypt(monkeypatch):
+    monkeypatch.setattr(settings, 'password_hash_algorithm', 'bcrypt')
+    monkeypatch.setattr(settings, 'bcrypt_rounds', 4)
+
+    hashed = encode_password('test_password')
+    assert hashed.startswith('bcrypt$')
+    assert validate_password('test_password', hashed) is True
+    assert validate_password('invalid_password', hashed) is False
+    assert password_needs_rehash(hashed) is False
+
+    monkeypatch.setattr(settings, 'bcrypt_rounds', 5)
+    assert password_needs_rehash(hashed) is True
+
+    monkeypatch.setattr(settings, 'password_hash_algorithm', 'pbkdf2_sha256')
+    assert password_needs_rehash(hashed) is True
+
+
+def test_legacy_password_hash():
+    legacy_hashed = f"test_salt${hash_password('test_password', 'test_salt')}"
+
+    assert validate_password('test_password', legacy_hashed) is True
+    assert validate_password('invalid_password', legacy_hashed) is False
+    assert password_needs_rehash(legacy_hashed) is True
+
+
+if __name__ == '__main__':
+    asyncio.run(test_password_hasher_matches_sync_functions())
+    asyncio.run(test_password_hasher_limits_concurrency())
+    test_legacy_password_hash()
@@ -0,0 +1,45 @@
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.config import Settings
+from Task_Manager.src.database.database import User, get_engine_options
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.users.hashing import hash_password, password_needs_rehash, validate_password
+from Task_Manager.src.users.utils import create_user_token, rehash_user_password
+
+
+async def test_rehash_after_login_does_not_wait_for_request_session(tmp_path):
+    # Файл SQLite с единственным соединением-писателем, как у приложения:
+    settings = Settings(db_url=f"sqlite+aiosqlite:///{tmp_path / 'rehash.db'}", db_pool_timeout=1)
+    engine = create_async_engine(settings.db_url, **get_engine_options(settings))
+    try:
+        await run_migrations(bind=engine)
+        session_maker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async with session_maker() as session:
+            legacy_hash = f"salt${hash_password('password', 'salt')}"
+            user = await session.execute(insert(User).values(username='legacy', email='legacy@mail.ru',
+                                                             hashed_password=legacy_hash).returning(User.id))
+            user_id = user.scalar()
+            await session.commit()
+
+        # Сессия запроса остается открытой, пока выполняются фоновые задачи ответа:
+        async with session_maker() as session:
+            token = await create_user_token(session=session, user_id=user_id)
+            assert token is not None and token.token
+
+            await rehash_user_password(user_id=user_id, password='password', session_maker=session_maker)
+
+        async with session_maker() as session:
+            hashed_password = await session.execute(select(User.hashed_password).filter(User.id == user_id))
+            hashed_password = hashed_password.scalar()
+
+        assert hashed_password != legacy_hash
+        assert not password_needs_rehash(hashed_password)
+        assert validate_password('password', hashed_password)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_rehash_after_login_does_not_wait_for_request_session()
@@ -0,0 +1,152 @@
+import pytest
+
+from sqlalchemy import insert, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from Task_Manager.src.database.database import Base
+from Task_Manager.src.database.migrations import MIGRATIONS, MigrationError, get_schema_version, run_migrations, \
+    schema_version
+
+
+def get_table_names(conn):
+    return inspect(conn).get_table_names()
+
+
+def get_index_names(conn, table_name):
+    return {index['name'] for index in inspect(conn).get_indexes(table_name)}
+
+
+def get_unique_index_names(conn, table_name):
+    return {index['name'] for index in inspect(conn).get_indexes(table_name) if index['unique']}
+
+
+async def apply_migrations(engine, migrations):
+    for pending in migrations:
+        async with engine.begin() as conn:
+            await get_schema_version(conn)
+            await pending.upgrade(conn)
+            await conn.execute(insert(schema_version).values(version=pending.version,
+                                                             description=pending.description))
+
+
+def get_column_names(conn, table_name):
+    return {column['name'] for column in inspect(conn).get_columns(table_name)}
+
+
+async def test_run_migrations_creates_schema_once():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        assert await run_migrations(bind=engine) == MIGRATIONS[-1].version
+
+        async with engine.connect() as conn:
+            assert {'user', 'task', 'token', 'schema_version'} <= set(await conn.run_sync(get_table_names))
+            applied = await conn.execute(text("SELECT count(*) FROM schema_version"))
+            assert applied.scalar() == len(MIGRATIONS)
+
+        # Повторный запуск ничего не применяет:
+        assert await run_migrations(bind=engine) == MIGRATIONS[-1].version
+        async with engine.connect() as conn:
+            applied = await conn.execute(text("SELECT count(*) FROM schema_version"))
+            assert applied.scalar() == len(MIGRATIONS)
+    finally:
+        await engine.dispose()
+
+
+async def test_run_migrations_upgrades_database_created_without_them():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        # Схема в том виде, в котором ее создавал create_all до появления индексов и миграций:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, "
+                                    "email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL, "
+                                    "registered_at TIMESTAMP, is_active BOOLEAN NOT NULL)"))
+            await conn.execute(text("CREATE TABLE task (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                                    "title VARCHAR NOT NULL, is_complete BOOLEAN)"))
+            await conn.execute(text("INSERT INTO user (username, email, hashed_password, is_active) "
+                                    "VALUES ('first', 'same@mail.ru', 'hash', 1), ('second', 'same@mail.ru', 'hash', 1)"))
+            await conn.execute(text("INSERT INTO task (user_id, title, is_complete) VALUES (1, 'done', 1)"))
+
+        # Уникальный индекс нельзя создать при наличии дубликатов email, миграция 2 не применяется, и версия схемы
+        # не записывается, пока дубликаты не будут удалены:
+        with pytest.raises(MigrationError, match='ix_user_email'):
+            await run_migrations(bind=engine)
+        async with engine.begin() as conn:
+            assert await get_schema_version(conn) == 1
+            await conn.execute(text("DELETE FROM user WHERE username = 'second'"))
+
+        assert await run_migrations(bind=engine) == MIGRATIONS[-1].version
+
+        async with engine.connect() as conn:
+            assert 'token' in await conn.run_sync(get_table_names)
+            assert {'ix_task_user_id_is_complete', 'ix_task_completed_at'} <= await conn.run_sync(get_index_names, 'task')
+            assert 'ix_user_email' in await conn.run_sync(get_unique_index_names, 'user')
+            assert 'task_archive' in await conn.run_sync(get_table_names)
+            # Возраст ранее завершенных задач отсчитывается от миграции:
+            completed_at = await conn.execute(text("SELECT completed_at FROM task WHERE title = 'done'"))
+            assert completed_at.scalar() is not None
+    finally:
+        await engine.dispose()
+
+
+async def test_run_migrations_creates_email_index_skipped_by_migration_2():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        # БД, в которой миграция 2 пропустила уникальный индекс из-за дубликатов email и записала свою версию:
+        await apply_migrations(engine, [pending for pending in MIGRATIONS if pending.version < 7])
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_user_email"))
+            await conn.execute(text("INSERT INTO user (username, email, hashed_password, is_active) "
+                                    "VALUES ('first', 'same@mail.ru', 'hash', 1), ('second', 'same@mail.ru', 'hash', 1)"))
+
+        with pytest.raises(MigrationError):
+            await run_migrations(bind=engine)
+        async with engine.begin() as conn:
+            assert await get_schema_version(conn) == 6
+            await conn.execute(text("DELETE FROM user WHERE username = 'second'"))
+
+        assert await run_migrations(bind=engine) == MIGRATIONS[-1].version
+        async with engine.connect() as conn:
+            assert 'ix_user_email' in await conn.run_sync(get_unique_index_names, 'user')
+    finally:
+        await engine.dispose()
+
+
+async def test_run_migrations_gives_archived_tasks_own_id():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        # БД версии 5, в которой ключом архива был id задачи:
+        await apply_migrations(engine, MIGRATIONS[:5])
+        async with engine.begin() as conn:
+            await conn.execute(text("INSERT INTO task_archive (id, user_id, title, archived_at) "
+                                    "VALUES (7, 1, 'seventh', '2023-01-01'), (3, 1, 'third', '2023-01-02')"))
+
+        assert await run_migrations(bind=engine) == MIGRATIONS[-1].version
+
+        async with engine.connect() as conn:
+            archived = await conn.execute(text("SELECT id, task_id, title FROM task_archive ORDER BY id"))
+            assert archived.all() == [(1, 3, 'third'), (2, 7, 'seventh')]
+            assert 'ix_task_archive_user_id_id' in await conn.run_sync(get_index_names, 'task_archive')
+    finally:
+        await engine.dispose()
+
+
+async def test_run_migrations_builds_schema_of_current_models():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        # Миграции применяют зафиксированные схемы, но в итоге должны прийти к схеме текущих моделей:
+        async with engine.connect() as conn:
+            for table in Base.metadata.sorted_tables:
+                assert await conn.run_sync(get_column_names, table.name) == set(table.columns.keys())
+                assert {index.name for index in table.indexes} <= await conn.run_sync(get_index_names, table.name)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_run_migrations_creates_schema_once()
+    test_run_migrations_upgrades_database_created_without_them()
+    test_run_migrations_creates_email_index_skipped_by_migration_2()
+    test_run_migrations_gives_archived_tasks_own_id()
+    test_run_migrations_builds_schema_of_current_models()
@@ -0,0 +1,75 @@
+import os
+import time
+
+from typing import Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.templating import Jinja2Templates
+
+from Task_Manager.src.users.pages import StaticPages
+
+
+def create_app(directory: str) -> Tuple[FastAPI, StaticPages]:
+    with open(os.path.join(directory, 'base.html'), 'w') as file:
+        file.write('<title>{{ app_name }}</title>{% block content %}{% endblock %}')
+    with open(os.path.join(directory, 'page.html'), 'w') as file:
+        file.write("{% extends 'base.html' %}{% block content %}<a href=\"{{ url_for('page') }}\"></a>"
+                   "{% if failed == True %}failed{% endif %}{% endblock %}")
+
+    app = FastAPI()
+    pages = StaticPages(templates=Jinja2Templates(directory=directory), check_interval=0, max_age=60)
+
+    @app.get('/page', name='page')
+    async def page(request: Request):
+        return pages.response(request=request, name='page.html')
+
+    @app.post('/page')
+    async def page_failed(request: Request):
+        return pages.response(request=request, name='page.html', cacheable=False, failed=True)
+
+    return app, pages
+
+
+def test_static_pages_are_rendered_once_and_served_with_etag(tmp_path):
+    app, pages = create_app(str(tmp_path))
+    client = TestClient(app)
+
+    response = client.get('/page')
+    assert response.status_code == 200
+    assert '<a href="/page">' in response.text and 'failed' not in response.text
+    assert response.headers['cache-control'] == 'public, max-age=60'
+
+    not_modified = client.get('/page', headers={'If-None-Match': response.headers['etag']})
+    assert not_modified.status_code == 304
+
+    failed = client.post('/page')
+    assert 'failed' in failed.text
+    assert failed.headers['cache-control'] == 'no-store' and 'etag' not in failed.headers
+
+    client.get('/page')
+    client.post('/page')
+    assert pages.renders == 2
+
+
+def test_static_pages_are_rerendered_after_template_change(tmp_path):
+    app, pages = create_app(str(tmp_path))
+    client = TestClient(app)
+    etag = client.get('/page').headers['etag']
+
+    # Изменяется базовый шаблон, от которого наследуется страница:
+    base_path = os.path.join(str(tmp_path), 'base.html')
+    with open(base_path, 'w') as file:
+        file.write('<title>changed</title>{% block content %}{% endblock %}')
+    mtime = time.time() + 10
+    os.utime(base_path, (mtime, mtime))
+
+    response = client.get('/page', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert '<title>changed</title>' in response.text
+    assert response.headers['etag'] != etag
+
+
+if __name__ == '__main__':
+    test_static_pages_are_rendered_once_and_served_with_etag()
+    test_static_pages_are_rerendered_after_template_change()
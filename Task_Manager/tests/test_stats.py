@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+from datetime import datetime, timedelta
+
+from Task_Manager.src.stats import collect_stats, run_stats_logging
+from Task_Manager.src.users.cache import token_cache
+from Task_Manager.src.users.models import CachedUser
+
+
+async def test_stats_logging_writes_token_cache_stats(caplog):
+    token_cache.clear()
+    token_cache.set('token', CachedUser(id=1, is_active=True, expires=datetime.now() + timedelta(days=1)))
+    assert collect_stats()['token_cache']['size'] == 1
+
+    caplog.set_level(logging.INFO)
+    stats_logging = asyncio.create_task(run_stats_logging(interval=0.01))
+    try:
+        for _ in range(100):
+            if any(record.getMessage().startswith('token_cache: size=1,') for record in caplog.records):
+                break
+            await asyncio.sleep(0.01)
+        assert any(record.getMessage().startswith('token_cache: size=1,') for record in caplog.records)
+    finally:
+        stats_logging.cancel()
+        token_cache.clear()
+
+
+def test_collect_stats_includes_all_sources():
+    assert set(collect_stats()) == {'token_cache', 'password_hasher', 'write_batcher', 'task_page_cache',
+                                   'task_event_broker'}
+
+
+if __name__ == '__main__':
+    asyncio.run(test_stats_logging_writes_token_cache_stats())
+    test_collect_stats_includes_all_sources()
@@ -0,0 +1,124 @@
+import datetime
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.database.database import Task
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.tasks import add_task, archive_completed_tasks, bulk_add_tasks, bulk_set_tasks_complete, \
+    get_archived_tasks_page, get_task_counts, get_tasks_page, restore_archived_tasks, search_tasks, toggle_task
+
+
+async def test_archive_moves_only_old_completed_tasks_in_batches():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            created = await bulk_add_tasks(session=session, user_id=1, titles=['old one', 'old two', 'recent', 'open'])
+            await bulk_set_tasks_complete(session=session, user_id=1, task_ids=[result.id for result in created[:3]],
+                                          is_complete=True)
+            month_ago = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+            await session.execute(update(Task).where(Task.id.in_([created[0].id, created[1].id]))
+                                  .values(completed_at=month_ago))
+            await session.commit()
+
+        archived = await archive_completed_tasks(session_maker=session_maker, older_than=datetime.timedelta(days=1),
+                                                 batch_size=1)
+        assert archived == 2
+
+        async with session_maker() as session:
+            page = await get_tasks_page(session=session, user_id=1)
+            assert [task.title for task in page.tasks] == ['recent', 'open']
+            assert (await get_task_counts(session=session, user_id=1)).total == 2
+            assert (await search_tasks(session=session, user_id=1, query='old')).tasks == []
+
+            archive = await get_archived_tasks_page(session=session, user_id=1, limit=1)
+            assert [task.title for task in archive.tasks] == ['old one']
+            archive = await get_archived_tasks_page(session=session, user_id=1, after=archive.next_after)
+            assert [task.title for task in archive.tasks] == ['old two']
+            assert archive.tasks[0].completed_at is not None
+            assert (await get_archived_tasks_page(session=session, user_id=2)).tasks == []
+    finally:
+        await engine.dispose()
+
+
+async def test_restore_returns_archived_tasks_of_owner():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            first = await add_task(session=session, user_id=1, title='first')
+            last = await add_task(session=session, user_id=1, title='last')
+            await toggle_task(session=session, user_id=1, task_id=first.id)
+            await toggle_task(session=session, user_id=1, task_id=last.id)
+            await session.commit()
+
+        await archive_completed_tasks(session_maker=session_maker, older_than=datetime.timedelta(0))
+
+        async with session_maker() as session:
+            archive = (await get_archived_tasks_page(session=session, user_id=1)).tasks
+            assert [task.task_id for task in archive] == [first.id, last.id]
+
+            # Таблица задач пуста, поэтому id первой задачи из архива занимается новой задачей:
+            await session.execute(delete(Task))
+            reused = await add_task(session=session, user_id=1, title='reused id')
+            assert reused.id == first.id
+
+            other_user = await restore_archived_tasks(session=session, user_id=2, archive_ids=[archive[0].id])
+            assert other_user.tasks == [] and other_user.results[0].ok is False
+
+            restored = await restore_archived_tasks(session=session, user_id=1,
+                                                    archive_ids=[archive[0].id, archive[1].id, 999])
+            await session.commit()
+
+            assert [result.ok for result in restored.results] == [True, True, False]
+            assert restored.tasks[0].id == last.id
+            assert restored.tasks[1].id not in (first.id, last.id)
+            assert all(task.is_complete for task in restored.tasks)
+            assert (await get_archived_tasks_page(session=session, user_id=1)).tasks == []
+            assert (await get_task_counts(session=session, user_id=1)).completed == 2
+
+        # Восстановленные задачи получают новое время завершения и не переносятся в архив сразу:
+        assert await archive_completed_tasks(session_maker=session_maker, older_than=datetime.timedelta(days=1)) == 0
+    finally:
+        await engine.dispose()
+
+
+async def test_archive_task_with_reused_id():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        for title in ('first', 'second'):
+            # После архивации таблица задач пуста, поэтому новая задача получает id заархивированной:
+            async with session_maker() as session:
+                task = await add_task(session=session, user_id=1, title=title)
+                await toggle_task(session=session, user_id=1, task_id=task.id)
+                await session.commit()
+            assert await archive_completed_tasks(session_maker=session_maker, older_than=datetime.timedelta(0)) == 1
+
+        async with session_maker() as session:
+            archive = (await get_archived_tasks_page(session=session, user_id=1)).tasks
+            assert [(task.task_id, task.title) for task in archive] == [(task.id, 'first'), (task.id, 'second')]
+
+            # Одинаковый id получает только одна из восстановленных задач:
+            restored = await restore_archived_tasks(session=session, user_id=1,
+                                                    archive_ids=[task.id for task in archive])
+            await session.commit()
+
+            assert [result.ok for result in restored.results] == [True, True]
+            assert [(task.id, task.title) for task in restored.tasks] == [(task.id, 'first'),
+                                                                          (task.id + 1, 'second')]
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_archive_moves_only_old_completed_tasks_in_batches()
+    test_restore_returns_archived_tasks_of_owner()
+    test_archive_task_with_reused_id()
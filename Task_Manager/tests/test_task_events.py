@@ -0,0 +1,132 @@
+import asyncio
+
+import orjson
+import pytest
+
+from anyio.from_thread import start_blocking_portal
+from httpx import AsyncClient
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from Task_Manager.src.routers import api_routes
+from Task_Manager.src.tasks import events as task_events
+from Task_Manager.src.tasks.events import TaskEventBroker, format_sse_event, stream_task_events
+from .app_for_test import create_app_for_test, create_user_with_token
+
+
+async def test_task_event_broker_delivers_events_to_user_subscriptions():
+    broker = TaskEventBroker(max_queue_size=10, max_subscriptions_per_user=10)
+    first, second = broker.subscribe(1), broker.subscribe(1)
+    other_user = broker.subscribe(2)
+
+    broker.publish(1, {'type': 'deleted', 'ids': [1]})
+
+    assert await first.get() == {'type': 'deleted', 'ids': [1]}
+    assert await second.get() == {'type': 'deleted', 'ids': [1]}
+    assert other_user.queue.empty()
+    assert broker.stats()['delivered'] == 2
+
+
+async def test_task_event_broker_drops_slow_subscription():
+    broker = TaskEventBroker(max_queue_size=2, max_subscriptions_per_user=10)
+    slow, fast = broker.subscribe(1), broker.subscribe(1)
+
+    for task_id in range(3):
+        broker.publish(1, {'type': 'deleted', 'ids': [task_id]})
+        await fast.get()
+
+    # Недоставленные события отброшены, подписчик получает признак закрытия и больше не получает событий:
+    assert await slow.get() is None
+    assert slow.queue.empty()
+    assert broker.stats()['subscriptions'] == 1
+    assert broker.stats()['dropped'] == 1
+
+
+async def test_task_event_broker_limits_subscriptions_per_user():
+    broker = TaskEventBroker(max_queue_size=10, max_subscriptions_per_user=2)
+    oldest = broker.subscribe(1)
+    broker.subscribe(1)
+    broker.subscribe(1)
+
+    assert await oldest.get() is None
+    assert broker.stats()['subscriptions'] == 2
+
+
+async def test_stream_task_events_sends_keepalive_and_reset():
+    broker = TaskEventBroker(max_queue_size=10, max_subscriptions_per_user=10)
+    subscription = broker.subscribe(1)
+    events = stream_task_events(subscription, keepalive=0.01, broker=broker)
+
+    assert await events.__anext__() == b': keepalive\n\n'
+
+    broker.publish(1, {'type': 'reset'})
+    assert await events.__anext__() == format_sse_event({'type': 'reset'})
+
+    subscription.close()
+    chunk = await events.__anext__()
+    assert chunk.startswith(b'event: reset\n')
+    assert orjson.loads(chunk.split(b'data: ')[1]) == {'type': 'reset'}
+    await events.aclose()
+    assert broker.stats()['subscriptions'] == 0
+
+
+async def test_events_stream_does_not_hold_reader_connection(tmp_path, monkeypatch):
+    async with create_app_for_test(tmp_path / 'events.db', monkeypatch) as test_app:
+        _, token = await create_user_with_token(test_app.session_maker, email='events@mail.ru')
+
+        # Поток сообщает, сколько соединений-читателей занято, пока он передается клиенту:
+        async def stream_checked_out_connections(subscription, keepalive):
+            yield str(test_app.read_engine.pool.checkedout()).encode()
+            api_routes.task_event_broker.unsubscribe(subscription)
+
+        monkeypatch.setattr(api_routes, 'stream_task_events', stream_checked_out_connections)
+        async with AsyncClient(app=test_app.app, base_url="http://test") as client:
+            response = await client.get('/api/v1/tasks/events', headers={'Authorization': f'Bearer {token}'})
+            assert response.status_code == 200
+            assert response.text == '0'
+
+            response = await client.get('/api/v1/tasks/events', headers={'Authorization': 'Bearer wrong'})
+            assert response.status_code == 401
+
+
+def test_events_websocket(tmp_path, monkeypatch):
+    broker = TaskEventBroker(max_queue_size=10, max_subscriptions_per_user=10)
+    monkeypatch.setattr(api_routes, 'task_event_broker', broker)
+    monkeypatch.setattr(task_events, 'task_event_broker', broker)
+
+    # Приложение, БД и WebSocket работают в одном цикле событий портала, который TestClient использует для запросов:
+    with start_blocking_portal() as portal, \
+            portal.wrap_async_context_manager(create_app_for_test(tmp_path / 'events.db', monkeypatch)) as test_app:
+        _, token = portal.call(create_user_with_token, test_app.session_maker, 'events@mail.ru')
+        client = TestClient(test_app.app)
+        client.portal = portal
+        headers = {'Authorization': f'Bearer {token}'}
+
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            with client.websocket_connect('/api/v1/tasks/ws', headers={'Authorization': 'Bearer wrong'}):
+                pass
+        assert disconnect.value.code == WS_1008_POLICY_VIOLATION
+
+        with client.websocket_connect('/api/v1/tasks/ws', headers=headers) as websocket:
+            response = client.post('/api/v1/tasks', json={'title': 'new'}, headers=headers)
+            assert response.status_code == 201
+
+            event = websocket.receive_json()
+            assert event['type'] == 'created'
+            assert [task['id'] for task in event['tasks']] == [response.json()['id']]
+            assert broker.stats()['subscriptions'] == 1
+
+        # После отключения клиента подписка удаляется:
+        for _ in range(100):
+            if broker.stats()['subscriptions'] == 0:
+                break
+            portal.call(asyncio.sleep, 0.01)
+        assert broker.stats()['subscriptions'] == 0
+
+
+if __name__ == '__main__':
+    asyncio.run(test_task_event_broker_delivers_events_to_user_subscriptions())
+    asyncio.run(test_task_event_broker_drops_slow_subscription())
+    asyncio.run(test_task_event_broker_limits_subscriptions_per_user())
+    asyncio.run(test_stream_task_events_sends_keepalive_and_reset())
@@ -0,0 +1,84 @@
+import csv
+import io
+
+import orjson
+
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Base
+from Task_Manager.src.routers import api_routes
+from Task_Manager.src.tasks import ExportFormat, bulk_add_tasks, stream_tasks_export
+from .app_for_test import create_app_for_test, create_user_with_token
+
+
+async def create_session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        await bulk_add_tasks(session=session, user_id=1, titles=[f'task, "{i}"' for i in range(5)])
+        await bulk_add_tasks(session=session, user_id=2, titles=['other_user_task'])
+        await session.commit()
+    return engine, session_maker
+
+
+async def test_export_streams_ndjson_in_batches(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'export_batch_size', 2)
+    engine, session_maker = await create_session_maker()
+    try:
+        chunks = [chunk async for chunk in stream_tasks_export(user_id=1, export_format=ExportFormat.ndjson,
+                                                               session_maker=session_maker)]
+        assert len(chunks) == 3
+
+        tasks = [orjson.loads(line) for line in b''.join(chunks).splitlines()]
+        assert [task['title'] for task in tasks] == [f'task, "{i}"' for i in range(5)]
+        assert tasks[0]['is_complete'] is False
+    finally:
+        await engine.dispose()
+
+
+async def test_export_streams_csv_with_header():
+    engine, session_maker = await create_session_maker()
+    try:
+        chunks = [chunk async for chunk in stream_tasks_export(user_id=1, export_format=ExportFormat.csv,
+                                                               session_maker=session_maker)]
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+        assert rows[0] == ['id', 'title', 'is_complete']
+        assert [row[1] for row in rows[1:]] == [f'task, "{i}"' for i in range(5)]
+    finally:
+        await engine.dispose()
+
+
+async def test_export_route_holds_only_export_reader_connection(tmp_path, monkeypatch):
+    async with create_app_for_test(tmp_path / 'export.db', monkeypatch) as test_app:
+        user_id, token = await create_user_with_token(test_app.session_maker, email='export@mail.ru')
+        async with test_app.session_maker() as session:
+            await bulk_add_tasks(session=session, user_id=user_id, titles=['first', 'second'])
+            await session.commit()
+
+        # Выгрузка читает задачи из тестовой БД и запоминает, сколько соединений-читателей занято при отправке:
+        read_session_maker = async_sessionmaker(test_app.read_engine, expire_on_commit=False)
+        checked_out = []
+
+        async def stream_test_tasks_export(user_id, export_format):
+            async for chunk in stream_tasks_export(user_id=user_id, export_format=export_format,
+                                                   session_maker=read_session_maker):
+                checked_out.append(test_app.read_engine.pool.checkedout())
+                yield chunk
+
+        monkeypatch.setattr(api_routes, 'stream_tasks_export', stream_test_tasks_export)
+        async with AsyncClient(app=test_app.app, base_url="http://test") as client:
+            response = await client.get('/api/v1/tasks/export', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 200
+        assert [orjson.loads(line)['title'] for line in response.text.splitlines()] == ['first', 'second']
+        assert max(checked_out) == 1
+
+
+if __name__ == '__main__':
+    test_export_streams_ndjson_in_batches()
+    test_export_streams_csv_with_header()
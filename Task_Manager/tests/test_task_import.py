@@ -0,0 +1,76 @@
+import io
+import threading
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.config import get_settings
+from Task_Manager.src.database.database import Base
+from Task_Manager.src.tasks import ExportFormat, TaskFileParser, get_tasks_page, import_tasks
+
+
+async def create_session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def test_import_csv_in_batches(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'import_batch_size', 2)
+    engine, session_maker = await create_session_maker()
+    try:
+        file = io.BytesIO('id,title,is_complete\r\n1,"Купить, ""молоко""",True\r\n2,,False\r\n3,Second,0\r\n'
+                          '4,Third,yes\r\n'.encode())
+        async with session_maker() as session:
+            report = await import_tasks(session=session, user_id=1, file=file, import_format=ExportFormat.csv)
+            assert (report.imported, report.rejected) == (3, 1)
+            assert report.errors[0].line == 3
+
+            page = await get_tasks_page(session=session, user_id=1)
+            assert [(task.title, task.is_complete) for task in page.tasks] == [
+                ('Купить, "молоко"', True), ('Second', False), ('Third', True)
+            ]
+    finally:
+        await engine.dispose()
+
+
+async def test_import_ndjson_rejects_invalid_lines():
+    engine, session_maker = await create_session_maker()
+    try:
+        file = io.BytesIO(b'{"title": "first"}\n\nnot json\n[1]\n{"title": "second", "is_complete": true}\n')
+        async with session_maker() as session:
+            report = await import_tasks(session=session, user_id=1, file=file, import_format=ExportFormat.ndjson)
+            assert (report.imported, report.rejected) == (2, 2)
+            assert [error.line for error in report.errors] == [3, 4]
+            # Файл, переданный вызывающим, не закрывается:
+            assert not file.closed
+    finally:
+        await engine.dispose()
+
+
+async def test_import_parses_file_outside_event_loop(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'import_batch_size', 2)
+    parser_threads = set()
+    read_batch = TaskFileParser.read_batch
+
+    def read_batch_in_thread(self, size):
+        parser_threads.add(threading.get_ident())
+        return read_batch(self, size)
+
+    monkeypatch.setattr(TaskFileParser, 'read_batch', read_batch_in_thread)
+    engine, session_maker = await create_session_maker()
+    try:
+        file = io.BytesIO(b'{"title": "first"}\n{"title": "second"}\n{"title": "third"}\n')
+        async with session_maker() as session:
+            report = await import_tasks(session=session, user_id=1, file=file, import_format=ExportFormat.ndjson)
+            assert (report.imported, report.rejected) == (3, 0)
+
+        assert parser_threads and threading.get_ident() not in parser_threads
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_import_csv_in_batches()
+    test_import_ndjson_rejects_invalid_lines()
+    test_import_parses_file_outside_event_loop()
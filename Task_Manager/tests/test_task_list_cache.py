@@ -0,0 +1,48 @@
+from Task_Manager.src.tasks.cache import TaskListVersions, TaskPageCache, etag_matches
+from Task_Manager.src.tasks.models import TaskPage
+
+
+def test_task_list_version_changes_on_bump():
+    versions = TaskListVersions(max_size=10)
+    version = versions.get(1)
+    assert versions.get(1) == version
+
+    versions.bump(1)
+    assert versions.get(1) != version
+    assert versions.etag(1, version) != versions.etag(1, versions.get(1))
+
+
+def test_task_list_versions_are_not_reused_after_eviction():
+    versions = TaskListVersions(max_size=1)
+    first_version = versions.get(1)
+    versions.get(2)  # Вытесняет версию первого пользователя
+
+    assert versions.get(1) != first_version
+
+
+def test_task_page_cache_returns_page_only_for_same_version():
+    cache = TaskPageCache(max_size=2)
+    page = TaskPage(tasks=[])
+    cache.set((1, None, 50, None), 1, page)
+
+    assert cache.get((1, None, 50, None), 1) is page
+    assert cache.get((1, None, 50, None), 2) is None
+
+    cache.set((2, None, 50, None), 1, page)
+    cache.set((3, None, 50, None), 1, page)
+    assert cache.get((1, None, 50, None), 1) is None
+    assert cache.stats()['size'] == 2
+
+
+def test_etag_matches_if_none_match_header():
+    assert etag_matches('"a", "b"', '"b"') is True
+    assert etag_matches('*', '"b"') is True
+    assert etag_matches('"a"', '"b"') is False
+    assert etag_matches(None, '"b"') is False
+
+
+if __name__ == '__main__':
+    test_task_list_version_changes_on_bump()
+    test_task_list_versions_are_not_reused_after_eviction()
+    test_task_page_cache_returns_page_only_for_same_version()
+    test_etag_matches_if_none_match_header()
@@ -0,0 +1,98 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.database.database import Base, Task
+from Task_Manager.src.tasks import TaskStatus, add_task, bulk_add_tasks, bulk_delete_tasks, bulk_set_tasks_complete, \
+    delete_task, get_tasks_page, toggle_task
+
+
+async def create_session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        session.add_all([Task(user_id=1, title=f'task_{i}', is_complete=i % 2 == 0) for i in range(5)])
+        session.add(Task(user_id=2, title='other_user_task'))
+        await session.commit()
+    return engine, session_maker
+
+
+async def test_get_tasks_page_walks_pages_with_cursor():
+    engine, session_maker = await create_session_maker()
+    try:
+        async with session_maker() as session:
+            titles = []
+            page = await get_tasks_page(session=session, user_id=1, limit=2)
+            titles += [task.title for task in page.tasks]
+            while page.next_after is not None:
+                page = await get_tasks_page(session=session, user_id=1, after=page.next_after, limit=2)
+                titles += [task.title for task in page.tasks]
+
+            assert titles == [f'task_{i}' for i in range(5)]
+    finally:
+        await engine.dispose()
+
+
+async def test_get_tasks_page_filters_by_status():
+    engine, session_maker = await create_session_maker()
+    try:
+        async with session_maker() as session:
+            page = await get_tasks_page(session=session, user_id=1, status=TaskStatus.completed)
+            assert [task.title for task in page.tasks] == ['task_0', 'task_2', 'task_4']
+            assert page.next_after is None
+
+            page = await get_tasks_page(session=session, user_id=1, status=TaskStatus.open, limit=1)
+            assert [task.title for task in page.tasks] == ['task_1']
+            assert page.next_after == page.tasks[0].id
+    finally:
+        await engine.dispose()
+
+
+async def test_task_changes_are_limited_to_owner():
+    engine, session_maker = await create_session_maker()
+    try:
+        async with session_maker() as session:
+            task = await add_task(session=session, user_id=1, title='new_task')
+            await session.commit()
+            assert task.is_complete is False
+
+            assert await toggle_task(session=session, user_id=2, task_id=task.id) is None
+            assert (await toggle_task(session=session, user_id=1, task_id=task.id)).is_complete is True
+
+            assert await delete_task(session=session, user_id=2, task_id=task.id) is False
+            assert await delete_task(session=session, user_id=1, task_id=task.id) is True
+            assert await delete_task(session=session, user_id=1, task_id=task.id) is False
+            await session.commit()
+    finally:
+        await engine.dispose()
+
+
+async def test_bulk_operations_report_per_item_results():
+    engine, session_maker = await create_session_maker()
+    try:
+        async with session_maker() as session:
+            created = await bulk_add_tasks(session=session, user_id=1, titles=['first', ' ', 'second'])
+            assert [result.ok for result in created] == [True, False, True]
+            assert created[0].id < created[2].id
+
+            other_user_task_id = 6
+            task_ids = [created[0].id, created[2].id, other_user_task_id]
+            completed = await bulk_set_tasks_complete(session=session, user_id=1, task_ids=task_ids, is_complete=True)
+            assert [result.ok for result in completed] == [True, True, False]
+
+            deleted = await bulk_delete_tasks(session=session, user_id=1, task_ids=task_ids)
+            assert [result.ok for result in deleted] == [True, True, False]
+            await session.commit()
+
+            page = await get_tasks_page(session=session, user_id=2)
+            assert [task.title for task in page.tasks] == ['other_user_task']
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_get_tasks_page_walks_pages_with_cursor()
+    test_get_tasks_page_filters_by_status()
+    test_task_changes_are_limited_to_owner()
+    test_bulk_operations_report_per_item_results()
@@ -0,0 +1,76 @@
+from httpx import AsyncClient
+from sqlalchemy.future import select
+
+from Task_Manager.src.database.database import Task
+from Task_Manager.src.routers import db_routes
+from Task_Manager.src.tasks import add_task, get_tasks_page
+from .app_for_test import create_app_for_test, create_user_with_token
+
+
+async def get_task(session_maker, task_id: int):
+    async with session_maker() as session:
+        task = await session.execute(select(Task.id, Task.is_complete).filter(Task.id == task_id))
+        return task.first()
+
+
+async def test_update_and_delete_only_own_tasks(tmp_path, monkeypatch):
+    async with create_app_for_test(tmp_path / 'tasks.db', monkeypatch) as test_app:
+        owner_id, token = await create_user_with_token(test_app.session_maker, email='owner@mail.ru')
+        other_id, _ = await create_user_with_token(test_app.session_maker, email='other@mail.ru')
+        async with test_app.session_maker() as session:
+            own_task = await add_task(session=session, user_id=owner_id, title='own')
+            other_task = await add_task(session=session, user_id=other_id, title='other')
+            await session.commit()
+
+        async with AsyncClient(app=test_app.app, base_url="http://test", cookies={'access_token': f'Bearer {token}'}) \
+                as client:
+            # Задачи другого пользователя не изменяются и не удаляются, как если бы их не было:
+            response = await client.get(f'/update/{other_task.id}')
+            assert response.status_code == 404
+            assert (await get_task(test_app.session_maker, other_task.id)).is_complete is False
+
+            response = await client.get(f'/delete/{other_task.id}')
+            assert response.status_code == 404
+            assert await get_task(test_app.session_maker, other_task.id) is not None
+
+            response = await client.get(f'/update/{own_task.id}')
+            assert response.status_code == 302
+            assert (await get_task(test_app.session_maker, own_task.id)).is_complete is True
+
+            response = await client.get(f'/delete/{own_task.id}')
+            assert response.status_code == 302
+            assert await get_task(test_app.session_maker, own_task.id) is None
+
+            # Уже удаленной задачи нет:
+            response = await client.get(f'/delete/{own_task.id}')
+            assert response.status_code == 404
+
+
+async def test_add_with_empty_title_reads_tasks_without_writer(tmp_path, monkeypatch):
+    async with create_app_for_test(tmp_path / 'tasks.db', monkeypatch) as test_app:
+        user_id, token = await create_user_with_token(test_app.session_maker, email='owner@mail.ru')
+        async with test_app.session_maker() as session:
+            await add_task(session=session, user_id=user_id, title='existing')
+            await session.commit()
+
+        # Запоминаем, сколько соединений-писателей занято после чтения списка задач:
+        checked_out = []
+
+        async def get_tasks_page_with_writer_count(**kwargs):
+            page = await get_tasks_page(**kwargs)
+            checked_out.append(test_app.engine.pool.checkedout())
+            return page
+
+        monkeypatch.setattr(db_routes, 'get_tasks_page', get_tasks_page_with_writer_count)
+        async with AsyncClient(app=test_app.app, base_url="http://test", cookies={'access_token': f'Bearer {token}'}) \
+                as client:
+            response = await client.post('/add', data={'title': ''})
+
+        assert response.status_code == 200
+        assert 'existing' in response.text
+        assert checked_out == [0]
+
+
+if __name__ == '__main__':
+    test_update_and_delete_only_own_tasks()
+    test_add_with_empty_title_reads_tasks_without_writer()
@@ -0,0 +1,48 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.database.database import Task
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.tasks import bulk_add_tasks, delete_task, get_search_expression, search_tasks
+
+
+async def test_search_tasks_uses_index_kept_in_sync_by_triggers():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            await bulk_add_tasks(session=session, user_id=1, titles=['Купить молоко', 'Позвонить и купить хлеб',
+                                                                     'Написать отчет'])
+            session.add(Task(user_id=2, title='Купить билеты'))
+            await session.commit()
+
+            page = await search_tasks(session=session, user_id=1, query='куп')
+            assert sorted(task.title for task in page.tasks) == ['Купить молоко', 'Позвонить и купить хлеб']
+
+            page = await search_tasks(session=session, user_id=1, query='куп хлеб')
+            assert [task.title for task in page.tasks] == ['Позвонить и купить хлеб']
+
+            page = await search_tasks(session=session, user_id=1, query='куп', limit=1)
+            assert len(page.tasks) == 1
+            assert page.next_offset == 1
+
+            # Удаленная задача пропадает из индекса:
+            assert await delete_task(session=session, user_id=1, task_id=page.tasks[0].id) is True
+            await session.commit()
+            page = await search_tasks(session=session, user_id=1, query='куп')
+            assert len(page.tasks) == 1
+            assert page.next_offset is None
+    finally:
+        await engine.dispose()
+
+
+def test_search_expression_escapes_query_syntax():
+    assert get_search_expression(1, '   ') is None
+    assert get_search_expression(1, 'a "b') == 'owner:u1 AND title:("a"* """b"*)'
+    assert get_search_expression(2, 'NEAR OR') == 'owner:u2 AND title:("NEAR"* "OR"*)'
+
+
+if __name__ == '__main__':
+    test_search_tasks_uses_index_kept_in_sync_by_triggers()
+    test_search_expression_escapes_query_syntax()
@@ -0,0 +1,55 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.tasks import add_task, bulk_add_tasks, bulk_set_tasks_complete, delete_task, get_task_counts, \
+    rebuild_task_summaries, toggle_task
+
+
+async def test_task_counts_follow_task_changes():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            assert (await get_task_counts(session=session, user_id=1)).total == 0
+
+            task = await add_task(session=session, user_id=1, title='first')
+            created = await bulk_add_tasks(session=session, user_id=1, titles=['second', 'third'])
+            await toggle_task(session=session, user_id=1, task_id=task.id)
+            await bulk_set_tasks_complete(session=session, user_id=1, task_ids=[created[0].id], is_complete=True)
+            await delete_task(session=session, user_id=1, task_id=created[1].id)
+            await add_task(session=session, user_id=2, title='other_user_task')
+            await session.commit()
+
+            counts = await get_task_counts(session=session, user_id=1)
+            assert (counts.total, counts.open, counts.completed) == (2, 0, 2)
+            assert (await get_task_counts(session=session, user_id=2)).open == 1
+    finally:
+        await engine.dispose()
+
+
+async def test_rebuild_task_summaries_repairs_drift():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        await run_migrations(bind=engine)
+
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            await bulk_add_tasks(session=session, user_id=1, titles=['first', 'second'])
+            await session.execute(text("UPDATE task_summary SET total = 100"))
+            await session.commit()
+
+        assert await rebuild_task_summaries(bind=engine) == 1
+
+        async with session_maker() as session:
+            counts = await get_task_counts(session=session, user_id=1)
+            assert (counts.total, counts.open, counts.completed) == (2, 2, 0)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    test_task_counts_follow_task_changes()
+    test_rebuild_task_summaries_repairs_drift()
@@ -0,0 +1,38 @@
+from Task_Manager.src.users.throttling import SlidingWindowLimiter
+
+
+def test_sliding_window_limiter_rejects_over_limit():
+    limiter = SlidingWindowLimiter(limit=2, window=60, max_keys=10)
+
+    assert limiter.hit('test_email@mail.ru') == 0
+    assert limiter.hit('test_email@mail.ru') == 0
+    assert 0 < limiter.hit('test_email@mail.ru') <= 60
+
+    # Лимит считается для каждого ключа отдельно:
+    assert limiter.hit('other_email@mail.ru') == 0
+    assert limiter.stats()['rejected'] == 1
+
+
+def test_sliding_window_limiter_forgets_old_attempts():
+    limiter = SlidingWindowLimiter(limit=1, window=0, max_keys=10)
+
+    assert limiter.hit('test_email@mail.ru') == 0
+    assert limiter.hit('test_email@mail.ru') == 0
+
+
+def test_sliding_window_limiter_is_bounded():
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=2)
+    for key in ('first', 'second', 'third'):
+        limiter.hit(key)
+
+    assert limiter.stats()['keys'] == 2
+
+    # Самый старый ключ был забыт, поэтому попытка снова разрешена:
+    assert limiter.hit('first') == 0
+    assert limiter.hit('third') > 0
+
+
+if __name__ == '__main__':
+    test_sliding_window_limiter_rejects_over_limit()
+    test_sliding_window_limiter_forgets_old_attempts()
+    test_sliding_window_limiter_is_bounded()
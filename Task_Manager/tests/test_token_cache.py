@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from Task_Manager.src.users.cache import TokenCache
+from Task_Manager.src.users.models import CachedUser
+
+
+def make_user(user_id: int, expires_in: timedelta = timedelta(weeks=2)) -> CachedUser:
+    return CachedUser(id=user_id, is_active=True, expires=datetime.now() + expires_in)
+
+
+def test_token_cache_hit_and_miss():
+    cache = TokenCache(max_size=10, ttl=60)
+    assert cache.get('token') is None
+
+    cache.set('token', make_user(1))
+    assert cache.get('token').id == 1
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['size'] == 1
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2, ttl=60)
+    cache.set('first', make_user(1))
+    cache.set('second', make_user(2))
+
+    # Обращаемся к первому токену, чтобы вытеснен был второй:
+    cache.get('first')
+    cache.set('third', make_user(3))
+
+    assert cache.get('second') is None
+    assert cache.get('first').id == 1
+    assert cache.get('third').id == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_token_cache_respects_token_expiry():
+    cache = TokenCache(max_size=10, ttl=60)
+
+    # Просроченный токен не попадает в кэш:
+    cache.set('expired', make_user(1, expires_in=timedelta(seconds=-1)))
+    assert cache.get('expired') is None
+
+    # Запись живет не дольше, чем сам токен:
+    cache.set('short', make_user(1, expires_in=timedelta(microseconds=1)))
+    assert cache.get('short') is None
+
+
+def test_token_cache_invalidation():
+    cache = TokenCache(max_size=10, ttl=60)
+    cache.set('first', make_user(1))
+    cache.set('second', make_user(1))
+    cache.set('third', make_user(2))
+
+    cache.invalidate('third')
+    assert cache.get('third') is None
+
+    cache.invalidate_user(1)
+    assert cache.get('first') is None
+    assert cache.get('second') is None
+    assert cache.stats()['invalidations'] == 3
+    assert cache.stats()['size'] == 0
+
+
+if __name__ == '__main__':
+    test_token_cache_hit_and_miss()
+    test_token_cache_evicts_least_recently_used()
+    test_token_cache_respects_token_expiry()
+    test_token_cache_invalidation()
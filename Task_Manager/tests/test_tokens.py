@@ -0,0 +1,80 @@
+import time
+
+from datetime import datetime
+
+import jwt
+
+from Task_Manager.src.users import tokens
+from Task_Manager.src.users.tokens import RevocationList, create_access_token, decode_access_token, \
+    revoke_access_token, revocation_list, settings
+
+
+def test_access_token_round_trip():
+    token = create_access_token(user_id=1, is_active=True)
+
+    user = decode_access_token(token)
+    assert user.id == 1
+    assert user.is_active is True
+
+
+def test_access_token_with_invalid_signature():
+    token = create_access_token(user_id=1, is_active=True)
+    payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    forged_token = jwt.encode(payload, 'invalid_secret_key', algorithm=settings.jwt_algorithm)
+
+    assert decode_access_token(forged_token) is None
+    assert decode_access_token('not_a_token') is None
+
+
+def test_revoked_access_token():
+    token = create_access_token(user_id=1, is_active=True)
+    other_token = create_access_token(user_id=1, is_active=True)
+
+    revoke_access_token(token)
+    assert decode_access_token(token) is None
+    assert decode_access_token(other_token).id == 1
+
+
+def test_revoked_user_tokens():
+    token = create_access_token(user_id=2, is_active=True)
+
+    revocation_list.revoke_user(2)
+    assert decode_access_token(token) is None
+
+
+def test_user_revocation_with_sub_second_precision(monkeypatch):
+    # Токены выпускаются и отзываются в пределах одной секунды:
+    second = int(time.time()) - 1
+
+    def issue_token_at(timestamp: float) -> str:
+        monkeypatch.setattr(tokens, 'datetime', type('FixedDatetime', (datetime,), {
+            'now': classmethod(lambda cls, tz=None: datetime.fromtimestamp(timestamp)),
+        }))
+        return create_access_token(user_id=3, is_active=True)
+
+    issued_before = issue_token_at(second + 0.3)
+    monkeypatch.setattr(tokens.time, 'time', lambda: second + 0.5)
+    revocation_list.revoke_user(3)
+    issued_after = issue_token_at(second + 0.7)
+    monkeypatch.undo()
+
+    assert decode_access_token(issued_before) is None
+    assert decode_access_token(issued_after).id == 3
+
+
+def test_revocation_list_is_bounded():
+    revocations = RevocationList(max_size=2)
+    for jti in ('first', 'second', 'third'):
+        revocations.revoke_token(jti, expires_at=2 ** 40)
+
+    assert revocations.is_revoked('first', user_id=1, issued_at=0) is False
+    assert revocations.is_revoked('third', user_id=1, issued_at=0) is True
+
+
+if __name__ == '__main__':
+    test_access_token_round_trip()
+    test_access_token_with_invalid_signature()
+    test_revoked_access_token()
+    test_revoked_user_tokens()
+    test_user_revocation_with_sub_second_precision()
+    test_revocation_list_is_bounded()
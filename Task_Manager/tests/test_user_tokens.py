@@ -0,0 +1,125 @@
+import asyncio
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+
+from Task_Manager.src.database.database import Token, User
+from Task_Manager.src.database.migrations import run_migrations
+from Task_Manager.src.users.cache import token_cache
+from Task_Manager.src.users.models import CachedUser
+from Task_Manager.src.users.tokens import settings
+from Task_Manager.src.users.utils import create_user_token, delete_expired_tokens, revoke_user_token, \
+    run_token_sweeper
+
+
+async def create_session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    await run_migrations(bind=engine)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        await session.execute(insert(User).values(id=1, username='user', email='user@mail.ru', hashed_password='hash'))
+        await session.commit()
+    return engine, session_maker
+
+
+async def add_tokens(session_maker: async_sessionmaker, count: int, expires: datetime) -> None:
+    async with session_maker() as session:
+        await session.execute(insert(Token), [{'user_id': 1, 'expires': expires} for _ in range(count)])
+        await session.commit()
+
+
+async def get_tokens(session_maker: async_sessionmaker):
+    async with session_maker() as session:
+        tokens = await session.execute(select(Token.token).order_by(Token.id))
+        return tokens.scalars().all()
+
+
+def cache_token(token: str) -> None:
+    token_cache.set(token, CachedUser(id=1, is_active=True, expires=datetime.now() + timedelta(days=1)))
+
+
+async def test_delete_expired_tokens_in_batches():
+    engine, session_maker = await create_session_maker()
+    try:
+        await add_tokens(session_maker, count=5, expires=datetime.now() - timedelta(minutes=1))
+        await add_tokens(session_maker, count=2, expires=datetime.now() + timedelta(days=1))
+        valid_tokens = (await get_tokens(session_maker))[5:]
+
+        # Пять просроченных токенов удаляются пачками по два за три транзакции:
+        assert await delete_expired_tokens(batch_size=2, session_maker=session_maker) == 5
+        assert await get_tokens(session_maker) == valid_tokens
+        assert await delete_expired_tokens(batch_size=2, session_maker=session_maker) == 0
+    finally:
+        await engine.dispose()
+
+
+async def test_token_sweeper_deletes_expired_tokens(monkeypatch):
+    monkeypatch.setattr(settings, 'token_sweep_batch_size', 2)
+    monkeypatch.setattr(settings, 'token_sweep_interval', 0.01)
+    engine, session_maker = await create_session_maker()
+    await add_tokens(session_maker, count=3, expires=datetime.now() - timedelta(minutes=1))
+    await add_tokens(session_maker, count=1, expires=datetime.now() + timedelta(days=1))
+
+    sweeper = asyncio.create_task(run_token_sweeper(session_maker=session_maker))
+    try:
+        for _ in range(100):
+            if len(await get_tokens(session_maker)) == 1:
+                break
+            await asyncio.sleep(0.01)
+        assert len(await get_tokens(session_maker)) == 1
+    finally:
+        sweeper.cancel()
+        await engine.dispose()
+
+
+async def test_create_user_token_keeps_newest_tokens(monkeypatch):
+    monkeypatch.setattr(settings, 'max_tokens_per_user', 2)
+    engine, session_maker = await create_session_maker()
+    try:
+        tokens = []
+        for _ in range(3):
+            async with session_maker() as session:
+                token = await create_user_token(session=session, user_id=1)
+            cache_token(token.token)
+            tokens.append(token.token)
+
+        async with session_maker() as session:
+            token = await create_user_token(session=session, user_id=1)
+        tokens.append(token.token)
+
+        # Остаются только два самых новых токена, удаленные токены удаляются и из кэша:
+        assert await get_tokens(session_maker) == tokens[2:]
+        assert token_cache.get(tokens[0]) is None and token_cache.get(tokens[1]) is None
+        assert token_cache.get(tokens[2]).id == 1
+    finally:
+        token_cache.clear()
+        await engine.dispose()
+
+
+async def test_revoke_user_token_deletes_token_and_cache_entry():
+    engine, session_maker = await create_session_maker()
+    try:
+        async with session_maker() as session:
+            revoked = await create_user_token(session=session, user_id=1)
+            other = await create_user_token(session=session, user_id=1)
+        cache_token(revoked.token)
+        cache_token(other.token)
+
+        async with session_maker() as session:
+            await revoke_user_token(session=session, token=revoked.token)
+
+        assert await get_tokens(session_maker) == [other.token]
+        assert token_cache.get(revoked.token) is None
+        assert token_cache.get(other.token).id == 1
+    finally:
+        token_cache.clear()
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(test_delete_expired_tokens_in_batches())
+    asyncio.run(test_revoke_user_token_deletes_token_and_cache_entry())
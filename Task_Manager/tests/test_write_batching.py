@@ -0,0 +1,84 @@
+import asyncio
+
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from Task_Manager.src.database.batching import WriteBatcher
+from .session_for_test import TestTask, test_async_session_maker
+
+
+BATCH_USER_ID = 1000
+
+
+def add_task(title: str):
+    async def operation(session):
+        session.add(TestTask(title=title, user_id=BATCH_USER_ID))
+        return title
+    return operation
+
+
+async def failing_operation(session):
+    session.add(TestTask(title='failed', user_id=BATCH_USER_ID))
+    raise ValueError('Operation failed')
+
+
+async def get_batch_titles():
+    async with test_async_session_maker() as session:
+        titles = await session.execute(select(TestTask.title).filter(TestTask.user_id == BATCH_USER_ID))
+        return sorted(titles.scalars().all())
+
+
+async def clear_batch_tasks():
+    async with test_async_session_maker() as session:
+        await session.execute(delete(TestTask).filter(TestTask.user_id == BATCH_USER_ID))
+        await session.commit()
+
+
+async def test_write_batcher_commits_concurrent_operations_together():
+    batcher = WriteBatcher(session_maker=test_async_session_maker, max_delay=0.05, max_batch_size=10)
+    try:
+        results = await asyncio.gather(*(batcher.submit(add_task(f'task_{i}')) for i in range(5)))
+        assert results == [f'task_{i}' for i in range(5)]
+        assert await get_batch_titles() == [f'task_{i}' for i in range(5)]
+
+        stats = batcher.stats()
+        assert stats['batches'] == 1
+        assert stats['largest_batch'] == 5
+    finally:
+        await batcher.close()
+        await clear_batch_tasks()
+
+
+async def test_write_batcher_respects_max_batch_size():
+    batcher = WriteBatcher(session_maker=test_async_session_maker, max_delay=0.05, max_batch_size=2)
+    try:
+        await asyncio.gather(*(batcher.submit(add_task(f'task_{i}')) for i in range(5)))
+        assert len(await get_batch_titles()) == 5
+        assert batcher.stats()['batches'] == 3
+        assert batcher.stats()['largest_batch'] == 2
+    finally:
+        await batcher.close()
+        await clear_batch_tasks()
+
+
+async def test_write_batcher_isolates_failed_operation():
+    batcher = WriteBatcher(session_maker=test_async_session_maker, max_delay=0.05, max_batch_size=10)
+    try:
+        results = await asyncio.gather(batcher.submit(add_task('first')), batcher.submit(failing_operation),
+                                       batcher.submit(add_task('second')), return_exceptions=True)
+        assert results[0] == 'first'
+        assert isinstance(results[1], ValueError)
+        assert results[2] == 'second'
+
+        # Изменения упавшей операции откатываются, остальные фиксируются:
+        assert await get_batch_titles() == ['first', 'second']
+        assert batcher.stats()['retried_batches'] == 1
+    finally:
+        await batcher.close()
+        await clear_batch_tasks()
+
+
+if __name__ == '__main__':
+    test_write_batcher_commits_concurrent_operations_together()
+    test_write_batcher_respects_max_batch_size()
+    test_write_batcher_isolates_failed_operation()